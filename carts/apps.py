@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CartsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "carts"
+
+    def ready(self):
+        # Регистрируем обработчики сигналов
+        from . import signals  # noqa: F401
@@ -0,0 +1,47 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, redirect
+from common.profiling import query_budget
+from products.models import Product
+from .services import aadd_to_cart, acart_owner, adecrease_quantity, aincrease_quantity, aremove_from_cart
+from .views import _cart_json_response
+
+# Асинхронные варианты carts.views (ASYNC_VIEWS, запуск под ASGI). Ответ для AJAX
+# отрисовывается шаблоном, а шаблоны Django синхронные - он строится в потоке sync_to_async
+_acart_json_response = sync_to_async(_cart_json_response)
+
+
+@query_budget(10)
+async def cart_add(request, product_slug):
+    product = await aget_object_or_404(Product.objects.only('id', 'name'), slug=product_slug)
+    await aadd_to_cart(await acart_owner(request), product.id)
+    request.cart.invalidate()
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return await _acart_json_response(request, f'"{product.name}" добавлен в корзину')
+    return redirect(request.META.get('HTTP_REFERER'))
+
+
+@query_budget(6)
+async def cart_remove(request, cart_id):
+    if not await aremove_from_cart(await acart_owner(request), cart_id):
+        raise Http404('Товар не найден в корзине.')
+    request.cart.invalidate()
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return await _acart_json_response(request, 'Товар удален')
+    return redirect(request.META.get('HTTP_REFERER'))
+
+
+@query_budget(6)
+async def cart_change_quantity(request, cart_id):
+    owner = await acart_owner(request)
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'increment':
+            await aincrease_quantity(owner, cart_id)
+        elif action == 'decrement':
+            await adecrease_quantity(owner, cart_id)
+        request.cart.invalidate()
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return await _acart_json_response(request, 'Количество изменено')
+    return redirect(request.META.get('HTTP_REFERER'))
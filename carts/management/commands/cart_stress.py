@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from carts.models import Cart
+from carts.services import add_to_cart, decrease_quantity
+from common.testing import run_concurrently
+from products.models import Product
+from users.models import User
+
+STRESS_USERNAME = '__cart_stress__'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка атомарности корзины: потоки одновременно добавляют один и тот же товар, '
+        'затем одновременно уменьшают количество. Запускайте на локальной БД (PostgreSQL или SQLite).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--iterations', type=int, default=50, help='Операций на поток.')
+
+    def handle(self, *args, **options):
+        threads, iterations = options['threads'], options['iterations']
+        product = Product.objects.only('id').first()
+        if product is None:
+            raise CommandError(
+                'Нет товаров. Загрузите фикстуры: python manage.py loaddata products/fixtures/initial_data.json'
+            )
+
+        user, _ = User.objects.get_or_create(username=STRESS_USERNAME)
+        owner = {'user': user}
+        Cart.objects.filter(**owner).delete()
+        try:
+            elapsed = self._run(threads, iterations, lambda: add_to_cart(owner, product.id))
+            lines = list(Cart.objects.filter(**owner, product=product).values_list('id', 'quantity'))
+            expected = threads * iterations
+            self._report('upsert', elapsed, threads * iterations)
+            if len(lines) != 1 or lines[0][1] != expected:
+                raise CommandError(f'Ожидалась одна строка с количеством {expected}, получено: {lines}')
+
+            cart_id = lines[0][0]
+            elapsed = self._run(threads, iterations, lambda: decrease_quantity(owner, cart_id))
+            self._report('decrement', elapsed, threads * iterations)
+            if Cart.objects.filter(**owner).exists():
+                raise CommandError('После уменьшения до нуля строка корзины должна быть удалена.')
+        finally:
+            Cart.objects.filter(**owner).delete()
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS('Потерянных обновлений и дублей нет.'))
+
+    @staticmethod
+    def _run(threads, iterations, operation):
+        started = time.perf_counter()
+        errors = run_concurrently(threads, iterations, operation)
+        if errors:
+            raise CommandError(f'Ошибки в потоках: {errors[:3]}')
+        return time.perf_counter() - started
+
+    def _report(self, name, elapsed, operations):
+        self.stdout.write(f'{name}: {operations} операций за {elapsed:.2f} с ({operations / elapsed:.0f} оп/с)')
@@ -0,0 +1,62 @@
+from importlib import import_module
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from carts.models import Cart
+from carts.storage import AnonymousCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Разовый перенос старых корзин анонимов из таблицы cart (строки с Cart.session_key). '
+        'Корзины анонимов больше не хранятся в БД (carts.storage), поэтому эти строки никто не читает: '
+        'строки живых сессий переносятся в корзину анонима этой сессии (ANONYMOUS_CART_STORAGE), '
+        'затем все строки с session_key удаляются пачками, чтобы не держать долгих блокировок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать строки.')
+
+    def handle(self, *args, **options):
+        legacy = Cart.objects.filter(session_key__isnull=False)
+        live_sessions = Session.objects.filter(expire_date__gt=timezone.now()).values('session_key')
+        live = legacy.filter(session_key__in=live_sessions)
+
+        if options['dry_run']:
+            self.stdout.write(f'Строк корзин анонимов: {legacy.count()}, из них в живых сессиях: {live.count()}')
+            return
+
+        moved = self.move_to_sessions(live)
+        deleted = 0
+        while True:
+            ids = list(legacy.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            count, _ = Cart.objects.filter(id__in=ids).delete()
+            deleted += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено корзин в сессии: {moved}, удалено строк корзин: {deleted}'
+        ))
+
+    @staticmethod
+    def move_to_sessions(rows):
+        """
+        Добавляет строки в корзины анонимов их сессий (количества суммируются с тем,
+        что аноним уже положил в новую корзину). Возвращает число сессий.
+        """
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        rows = rows.order_by('session_key').values_list('session_key', 'product_id', 'quantity')
+        moved = 0
+        for session_key, items in groupby(rows.iterator(), key=lambda row: row[0]):
+            session = session_store(session_key)
+            cart = AnonymousCart(session)
+            for _, product_id, quantity in items:
+                cart.add(product_id, quantity)
+            session.save()
+            moved += 1
+        return moved
@@ -0,0 +1,15 @@
+from common.middleware import AsyncCapableMiddleware
+
+from .utils import RequestCart
+
+
+class CartMiddleware(AsyncCapableMiddleware):
+    """
+    Добавляет в запрос ленивую корзину request.cart.
+    Корзина загружается только при первом обращении и не более одного раза за запрос.
+    Должен стоять после SessionMiddleware и AuthenticationMiddleware.
+    """
+    def __call__(self, request):
+        # Одинаково для WSGI и ASGI: под ASGI get_response вернет корутину
+        request.cart = RequestCart(request)
+        return self.get_response(request)
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """
+    Перед созданием уникальных ограничений сливает дубли строк корзины
+    (суммирует количество в самую раннюю строку) и удаляет строки без владельца.
+    """
+    Cart = apps.get_model("carts", "Cart")
+    Cart.objects.filter(user__isnull=True, session_key__isnull=True).delete()
+
+    for owner in ("user", "session_key"):
+        duplicates = (
+            Cart.objects.filter(**{f"{owner}__isnull": False})
+            .values(owner, "product")
+            .annotate(
+                total=models.Sum("quantity"),
+                keep_id=models.Min("id"),
+                lines=models.Count("id"),
+            )
+            .filter(lines__gt=1)
+        )
+        for row in duplicates:
+            Cart.objects.filter(id=row["keep_id"]).update(quantity=row["total"])
+            Cart.objects.filter(
+                **{owner: row[owner], "product": row["product"]}
+            ).exclude(id=row["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carts", "0002_alter_cart_quantity"),
+        ("products", "0006_product_sort_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cart",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("user__isnull", False)),
+                fields=("user", "product"),
+                name="cart_user_product_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="cart",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("session_key__isnull", False)),
+                fields=("session_key", "product"),
+                name="cart_session_product_uniq",
+            ),
+        ),
+    ]
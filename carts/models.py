@@ -1,23 +1,41 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Sum, Window
 from users.models import User
-from products.models import Product
+from products.models import Product, sell_price_expression
 
 
 class CartQueryset(models.QuerySet):
     """
     Кастомный QuerySet для оптимизации запросов к корзине.
     """
+    def with_totals(self):
+        # Цена со скидкой, сумма по строке и итоги всей корзины (оконные функции)
+        # считаются в одном SQL-запросе вместе с товарами корзины.
+        line_total = ExpressionWrapper(
+            sell_price_expression('product__') * F('quantity'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+        return self.select_related('product').annotate(
+            sell_price=sell_price_expression('product__'),
+            line_total=line_total,
+            cart_total_quantity=Window(Sum('quantity')),
+            cart_total_price=Window(Sum(line_total)),
+        )
+
+    def _total(self, annotation, expression):
+        if annotation in self.query.annotations:
+            # Итоги уже есть в каждой строке выборки - берем из первой (результат кэшируется)
+            first = next(iter(self), None)
+            return getattr(first, annotation) if first else 0
+        return self.aggregate(total=expression)['total'] or 0
+
     def total_quantity(self):
         # Вычисляет общее количество товаров в корзине
-        if self:
-            return sum(cart.quantity for cart in self)
-        return 0
+        return self._total('cart_total_quantity', Sum('quantity'))
 
     def total_price(self):
         # Вычисляет общую стоимость
-        if self:
-            return sum(cart.product.sell_price * cart.quantity for cart in self)
-        return 0
+        return self._total('cart_total_price', Sum(sell_price_expression('product__') * F('quantity')))
 
 
 class Cart(models.Model):
@@ -27,6 +45,7 @@ class Cart(models.Model):
     user = models.ForeignKey(to=User, on_delete=models.CASCADE, blank=True, null=True, verbose_name='Пользователь')
     product = models.ForeignKey(to=Product, on_delete=models.CASCADE, verbose_name='Товар')
     quantity = models.PositiveSmallIntegerField(default=1, verbose_name='Количество')
+    # Корзины анонимов до переноса в кэш/сессию (carts.storage); удаляет cleanup_stale_carts
     session_key = models.CharField(max_length=32, blank=True, null=True)
     created_timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
 
@@ -36,10 +55,28 @@ class Cart(models.Model):
         db_table = 'cart'
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+        constraints = [
+            # Одна строка на товар у владельца корзины - цель для INSERT ... ON CONFLICT (carts.services)
+            models.UniqueConstraint(
+                fields=['user', 'product'], condition=models.Q(user__isnull=False), name='cart_user_product_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['session_key', 'product'], condition=models.Q(session_key__isnull=False),
+                name='cart_session_product_uniq',
+            ),
+        ]
 
     def __str__(self):
-        return f'Корзина для {self.user.username if self.user else "Анонима"} | Товар: {self.product.name}'
+        # Связанные объекты - только уже загруженные, иначе их id: __str__ не делает запросов
+        if self.user_id is None:
+            owner = 'Анонима'
+        else:
+            owner = self.user.username if Cart.user.is_cached(self) else f'пользователя №{self.user_id}'
+        product = self.product.name if Cart.product.is_cached(self) else f'№{self.product_id}'
+        return f'Корзина для {owner} | Товар: {product}'
 
     def products_price(self):
-        # Стоимость всех единиц этого товара
-        return round(self.product.sell_price * self.quantity, 2)
\ No newline at end of file
+        # Стоимость всех единиц этого товара (из аннотации with_totals(), если она есть)
+        if hasattr(self, 'line_total'):
+            return self.line_total
+        return round(self.product.sell_price * self.quantity, 2)
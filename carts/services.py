@@ -0,0 +1,146 @@
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import Product
+from .models import Cart
+from .storage import AnonymousCart
+
+# INSERT ... ON CONFLICT по частичному уникальному индексу корзины пользователя (Cart.Meta.constraints).
+# Синтаксис одинаков для PostgreSQL и SQLite (3.35+).
+UPSERT_SQL = """
+    INSERT INTO {table} (user_id, product_id, quantity, created_timestamp)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (user_id, product_id) WHERE user_id IS NOT NULL
+    DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity
+    RETURNING id, quantity
+"""
+
+# Перенос всей корзины анонима одним INSERT ... SELECT ... ON CONFLICT (количества суммируются).
+# JOIN отбрасывает товары, удаленные из каталога; column1/column2 - имена столбцов VALUES
+# и в PostgreSQL, и в SQLite
+MERGE_SQL = """
+    INSERT INTO {table} (user_id, product_id, quantity, created_timestamp)
+    SELECT %s, {product_table}.id, items.column2, %s
+    FROM (VALUES {values}) AS items JOIN {product_table} ON {product_table}.id = items.column1
+    WHERE items.column2 > 0
+    ON CONFLICT (user_id, product_id) WHERE user_id IS NOT NULL
+    DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity
+"""
+
+
+def cart_owner(request):
+    """
+    Владелец корзины текущего запроса: фильтр {'user': ...} для Cart или
+    корзина анонима (carts.storage.AnonymousCart), которая не хранится в БД.
+    """
+    if request.user.is_authenticated:
+        return {'user': request.user}
+    return request.cart.anonymous
+
+
+def add_to_cart(owner, product_id, quantity=1):
+    """
+    Добавляет товар в корзину одним запросом (upsert): новая строка или quantity + n.
+    Безопасно при одновременных запросах - без потерянных обновлений и дублей.
+    Возвращает (id строки, новое количество).
+    """
+    if isinstance(owner, AnonymousCart):
+        return owner.add(product_id, quantity)
+    sql = UPSERT_SQL.format(table=connection.ops.quote_name(Cart._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [owner['user'].pk, product_id, quantity, timezone.now()])
+        return cursor.fetchone()
+
+
+def increase_quantity(owner, cart_id, quantity=1):
+    """
+    Атомарно увеличивает количество (UPDATE ... SET quantity = quantity + n). Возвращает число строк.
+    """
+    if isinstance(owner, AnonymousCart):
+        return owner.increase(cart_id, quantity)
+    return Cart.objects.filter(id=cart_id, **owner).update(quantity=F('quantity') + quantity)
+
+
+def decrease_quantity(owner, cart_id, quantity=1):
+    """
+    Атомарно уменьшает количество, не опуская его ниже 1: условие quantity > n проверяется
+    в том же UPDATE (после блокировки строки). Если уменьшать некуда - строка удаляется
+    вторым запросом. Возвращает True, если строка удалена.
+    """
+    if isinstance(owner, AnonymousCart):
+        return owner.decrease(cart_id, quantity)
+    if Cart.objects.filter(id=cart_id, quantity__gt=quantity, **owner).update(quantity=F('quantity') - quantity):
+        return False
+    Cart.objects.filter(id=cart_id, quantity__lte=quantity, **owner).delete()
+    return True
+
+
+def remove_from_cart(owner, cart_id):
+    """
+    Удаляет строку корзины, только если она принадлежит владельцу.
+    """
+    if isinstance(owner, AnonymousCart):
+        return owner.remove(cart_id)
+    deleted, _ = Cart.objects.filter(id=cart_id, **owner).delete()
+    return bool(deleted)
+
+
+# Асинхронные варианты для carts.async_views. Корзина анонима читает сессию (при промахе
+# кэша - из БД), а upsert - сырой SQL без async-API, поэтому они выполняются в потоке
+# sync_to_async; UPDATE и DELETE корзины пользователя - через async-API QuerySet.
+
+async def acart_owner(request):
+    user = await request.auser()
+    # request.user и request.auser() кэшируют пользователя независимо: без этого шаблоны
+    # и request.cart загрузили бы его еще раз
+    request.user = user
+    if user.is_authenticated:
+        return {'user': user}
+    return request.cart.anonymous
+
+
+async def aadd_to_cart(owner, product_id, quantity=1):
+    return await sync_to_async(add_to_cart)(owner, product_id, quantity)
+
+
+async def aincrease_quantity(owner, cart_id, quantity=1):
+    if isinstance(owner, AnonymousCart):
+        return await sync_to_async(owner.increase)(cart_id, quantity)
+    return await Cart.objects.filter(id=cart_id, **owner).aupdate(quantity=F('quantity') + quantity)
+
+
+async def adecrease_quantity(owner, cart_id, quantity=1):
+    if isinstance(owner, AnonymousCart):
+        return await sync_to_async(owner.decrease)(cart_id, quantity)
+    if await Cart.objects.filter(id=cart_id, quantity__gt=quantity, **owner).aupdate(quantity=F('quantity') - quantity):
+        return False
+    await Cart.objects.filter(id=cart_id, quantity__lte=quantity, **owner).adelete()
+    return True
+
+
+async def aremove_from_cart(owner, cart_id):
+    if isinstance(owner, AnonymousCart):
+        return await sync_to_async(owner.remove)(cart_id)
+    deleted, _ = await Cart.objects.filter(id=cart_id, **owner).adelete()
+    return bool(deleted)
+
+
+def merge_anonymous_cart(user, items):
+    """
+    Переносит корзину анонима ({id товара: количество}) в корзину пользователя
+    одним запросом (bulk upsert), независимо от размера корзины.
+    Возвращает число перенесенных строк.
+    """
+    if not items:
+        return 0
+    sql = MERGE_SQL.format(
+        table=connection.ops.quote_name(Cart._meta.db_table),
+        product_table=connection.ops.quote_name(Product._meta.db_table),
+        values=', '.join(['(%s, %s)'] * len(items)),
+    )
+    params = [value for product_id, quantity in items.items() for value in (int(product_id), quantity)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, timezone.now(), *params])
+        return cursor.rowcount
@@ -0,0 +1,19 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .services import merge_anonymous_cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    При любом входе (логин, регистрация, другие способы аутентификации)
+    переносит корзину анонимной сессии в корзину пользователя.
+    Данные сессии анонима login() сохраняет, поэтому корзина анонима еще доступна.
+    """
+    cart = getattr(request, 'cart', None)
+    if cart is None or not cart.anonymous.items:
+        return
+    merge_anonymous_cart(user, cart.anonymous.items)
+    cart.anonymous.clear()
+    cart.invalidate()
@@ -0,0 +1,166 @@
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.cache import is_shared_cache
+from products.models import Product
+from .models import Cart
+
+CART_TOKEN_SESSION_KEY = '_cart_token'
+CART_ITEMS_SESSION_KEY = '_cart_items'
+CART_CACHE_KEY = 'carts:anonymous:{token}'
+
+
+class SessionCartStorage:
+    """
+    Корзина прямо в сессии. С подписанными куками (signed_cookies) она целиком хранится у клиента.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def load(self):
+        return dict(self.session.get(CART_ITEMS_SESSION_KEY, {}))
+
+    def save(self, items):
+        if items:
+            self.session[CART_ITEMS_SESSION_KEY] = items
+        else:
+            self.clear()
+
+    def clear(self):
+        self.session.pop(CART_ITEMS_SESSION_KEY, None)
+
+
+class CacheCartStorage:
+    """
+    Корзина в общем кэше по случайному токену; в сессии - только токен, который
+    не меняется при изменении корзины, поэтому сессия сохраняется один раз.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def load(self):
+        token = self.session.get(CART_TOKEN_SESSION_KEY)
+        if token is None:
+            return {}
+        return cache.get(CART_CACHE_KEY.format(token=token)) or {}
+
+    def save(self, items):
+        if not items:
+            return self.clear()
+        token = self.session.get(CART_TOKEN_SESSION_KEY)
+        if token is None:
+            token = self.session[CART_TOKEN_SESSION_KEY] = secrets.token_urlsafe(16)
+        cache.set(CART_CACHE_KEY.format(token=token), items, settings.SESSION_COOKIE_AGE)
+
+    def clear(self):
+        token = self.session.pop(CART_TOKEN_SESSION_KEY, None)
+        if token is not None:
+            cache.delete(CART_CACHE_KEY.format(token=token))
+
+
+STORAGES = {
+    'cache': CacheCartStorage,
+    'session': SessionCartStorage,
+}
+
+
+def get_storage_class():
+    """
+    Хранилище из ANONYMOUS_CART_STORAGE. С LocMemCache (кэш своего процесса) корзина в кэше
+    терялась бы при попадании запроса в другой воркер, поэтому она хранится в сессии.
+    """
+    if settings.ANONYMOUS_CART_STORAGE == 'cache' and not is_shared_cache():
+        return SessionCartStorage
+    return STORAGES[settings.ANONYMOUS_CART_STORAGE]
+
+
+class AnonymousCartLines(list):
+    """
+    Строки корзины анонима с тем же интерфейсом, что у QuerySet корзины в шаблонах.
+    """
+    def total_quantity(self):
+        return sum(line.quantity for line in self)
+
+    def total_price(self):
+        return sum((line.line_total for line in self), Decimal(0))
+
+
+class AnonymousCart:
+    """
+    Корзина анонима в хранилище ANONYMOUS_CART_STORAGE (get_storage_class): {id товара: количество}
+    (ключи - строки, чтобы структура сериализовалась в JSON подписанных кук).
+    В таблицу cart не пишется - при входе переносится в корзину пользователя
+    (carts.services.merge_anonymous_cart). Номер строки корзины - id товара.
+    Пока корзина пуста, сессия не создается и не читается.
+    """
+    def __init__(self, session):
+        self.storage = get_storage_class()(session)
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self.storage.load()
+        return self._items
+
+    def _save(self):
+        self.storage.save(self.items)
+
+    def add(self, product_id, quantity=1):
+        key = str(product_id)
+        self.items[key] = self.items.get(key, 0) + quantity
+        self._save()
+        return product_id, self.items[key]
+
+    def increase(self, product_id, quantity=1):
+        key = str(product_id)
+        if key not in self.items:
+            return 0
+        self.items[key] += quantity
+        self._save()
+        return 1
+
+    def decrease(self, product_id, quantity=1):
+        key = str(product_id)
+        if key not in self.items:
+            return False
+        if self.items[key] > quantity:
+            self.items[key] -= quantity
+            removed = False
+        else:
+            del self.items[key]
+            removed = True
+        self._save()
+        return removed
+
+    def remove(self, product_id):
+        if self.items.pop(str(product_id), None) is None:
+            return False
+        self._save()
+        return True
+
+    def clear(self):
+        self._items = {}
+        self.storage.clear()
+
+    def lines(self):
+        """
+        Строки корзины (несохраненные Cart с id = id товара) с ценой и суммой по строке.
+        Товары загружаются одним запросом; удаленные из каталога пропускаются.
+        """
+        if not self.items:
+            return AnonymousCartLines()
+        products = Product.objects.with_sell_price().in_bulk([int(key) for key in self.items])
+        lines = AnonymousCartLines()
+        for key, quantity in self.items.items():
+            product = products.get(int(key))
+            if product is None:
+                continue
+            line = Cart(id=product.id, product=product, quantity=quantity)
+            line.sell_price = product.sell_price
+            line.line_total = product.sell_price * quantity
+            lines.append(line)
+        return lines
@@ -1,10 +1,9 @@
 from django import template
-from carts.utils import get_user_carts
 
 register = template.Library()
 
 @register.inclusion_tag('carts/includes/included_cart.html', takes_context=True)
 def user_cart(context):
+    # Корзина запроса: общая для всех тегов и представлений в рамках одного запроса
     request = context['request']
-    carts = get_user_carts(request)
-    return {'carts': carts}
\ No newline at end of file
+    return {'carts': request.cart}
\ No newline at end of file
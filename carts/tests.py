@@ -1,3 +1,82 @@
-from django.test import TestCase
+from importlib import import_module
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from carts.models import Cart
+from carts.services import add_to_cart, decrease_quantity
+from carts.storage import AnonymousCart, CacheCartStorage, SessionCartStorage
+from common.testing import run_concurrently
+from products.models import Category, Product
+from users.models import User
+
+
+class ConcurrentCartTests(TransactionTestCase):
+    """
+    Атомарность корзины (carts.services): одновременные изменения одной строки без
+    потерянных обновлений и дублей. TransactionTestCase - потоки видят данные теста.
+    """
+    threads = 8
+    iterations = 10
+
+    def setUp(self):
+        category = Category.objects.create(name='Телефоны', slug='phones')
+        self.product = Product.objects.create(name='Телефон', slug='phone', category=category, price=100)
+        self.owner = {'user': User.objects.create(username='buyer')}
+
+    def test_concurrent_add_creates_one_row_with_summed_quantity(self):
+        errors = run_concurrently(self.threads, self.iterations, lambda: add_to_cart(self.owner, self.product.id))
+
+        self.assertEqual(errors, [])
+        lines = list(Cart.objects.filter(**self.owner).values_list('product_id', 'quantity'))
+        self.assertEqual(lines, [(self.product.id, self.threads * self.iterations)])
+
+    def test_concurrent_decrease_removes_row_without_going_below_one(self):
+        cart_id, _ = add_to_cart(self.owner, self.product.id, quantity=self.threads * self.iterations)
+
+        errors = run_concurrently(self.threads, self.iterations, lambda: decrease_quantity(self.owner, cart_id))
+
+        self.assertEqual(errors, [])
+        self.assertFalse(Cart.objects.filter(**self.owner).exists())
+
+
+class AnonymousCartStorageTests(TestCase):
+    """
+    Хранилище корзины анонима и перенос старых строк корзин анонимов из таблицы cart.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Телефоны', slug='phones')
+        cls.product = Product.objects.create(name='Телефон', slug='phone', category=category, price=100)
+
+    def new_session(self):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session.create()
+        return session
+
+    @override_settings(ANONYMOUS_CART_STORAGE='cache', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_cache_storage_falls_back_to_session_with_locmem(self):
+        self.assertIsInstance(AnonymousCart(self.new_session()).storage, SessionCartStorage)
+
+    @override_settings(ANONYMOUS_CART_STORAGE='cache', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_cache_storage_with_shared_cache(self):
+        self.assertIsInstance(AnonymousCart({}).storage, CacheCartStorage)
+
+    def test_cleanup_moves_live_session_rows_and_deletes_the_rest(self):
+        session = self.new_session()
+        AnonymousCart(session).add(self.product.id, 1)
+        session.save()
+        Cart.objects.create(session_key=session.session_key, product=self.product, quantity=2)
+        Cart.objects.create(session_key='expired-session', product=self.product, quantity=3)
+
+        call_command('cleanup_stale_carts', stdout=StringIO())
+
+        self.assertFalse(Cart.objects.filter(session_key__isnull=False).exists())
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session.session_key)
+        self.assertEqual(AnonymousCart(session).items, {str(self.product.id): 3})
@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+if settings.ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 app_name = 'carts'
 
@@ -8,4 +13,4 @@ urlpatterns = [
     path('cart-remove/<int:cart_id>/', views.cart_remove, name='cart_remove'),
     path('cart-change/<int:cart_id>/', views.cart_change_quantity, name='cart_change_quantity'),
 
-]
\ No newline at end of file
+]
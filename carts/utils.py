@@ -1,15 +1,59 @@
 from .models import Cart
+from .storage import AnonymousCart
 
 
-def get_user_carts(request):
+def get_user_carts(request, anonymous=None):
     """
     Утилита для получения корзины текущего пользователя.
     Работает как для авторизованных, так и для анонимных пользователей.
+    Строки корзины, цены и итоги загружаются одним запросом (CartQueryset.with_totals);
+    корзина анонима - из кэша или сессии (AnonymousCart), без обращения к таблице cart.
     """
     if request.user.is_authenticated:
-        return Cart.objects.filter(user=request.user).select_related('product')
+        return Cart.objects.filter(user=request.user).with_totals()
+    return (anonymous or AnonymousCart(request.session)).lines()
 
-    if not request.session.session_key:
-        return Cart.objects.none()
 
-    return Cart.objects.filter(session_key=request.session.session_key).select_related('product')
\ No newline at end of file
+class RequestCart:
+    """
+    Корзина текущего запроса (request.cart, см. carts.middleware.CartMiddleware).
+    Строки корзины с товарами и итогами загружаются лениво и один раз за запрос;
+    после изменения корзины нужно вызвать invalidate().
+    Поддерживает тот же интерфейс, что и QuerySet корзины в шаблонах:
+    проверка на пустоту, итерация, total_quantity, total_price.
+    """
+    def __init__(self, request):
+        self.request = request
+        self._carts = None
+        self._anonymous = None
+
+    @property
+    def anonymous(self):
+        # Корзина анонима; сессия читается только при первом обращении
+        if self._anonymous is None:
+            self._anonymous = AnonymousCart(self.request.session)
+        return self._anonymous
+
+    @property
+    def carts(self):
+        if self._carts is None:
+            self._carts = get_user_carts(self.request, self.anonymous)
+        return self._carts
+
+    def invalidate(self):
+        self._carts = None
+
+    def __iter__(self):
+        return iter(self.carts)
+
+    def __len__(self):
+        return len(self.carts)
+
+    def __bool__(self):
+        return bool(self.carts)
+
+    def total_quantity(self):
+        return self.carts.total_quantity()
+
+    def total_price(self):
+        return self.carts.total_price()
@@ -1,61 +1,52 @@
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
+from common.profiling import query_budget
 from products.models import Product
-from .models import Cart
-from .utils import get_user_carts
+from .services import add_to_cart, cart_owner, decrease_quantity, increase_quantity, remove_from_cart
 
 
+def _cart_json_response(request, message):
+    # request.cart загружается один раз: и для HTML компонента, и для счетчика
+    cart_component_html = render_to_string('carts/includes/included_cart.html',
+                                           {'carts': request.cart, 'request': request})
+    return JsonResponse({'message': message, 'cart_component_html': cart_component_html,
+                         'total_quantity': request.cart.total_quantity()})
+
+
+# Корзина анонима - в кэше или сессии (carts.storage); первое добавление создает сессию
+@query_budget(10)
 def cart_add(request, product_slug):
-    product = get_object_or_404(Product, slug=product_slug)
-    user = request.user if request.user.is_authenticated else None
-    session_key = request.session.session_key or request.session.create()
-    cart_item, created = Cart.objects.get_or_create(
-        user=user, session_key=session_key if not user else None, product=product
-    )
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    product = get_object_or_404(Product.objects.only('id', 'name'), slug=product_slug)
+    add_to_cart(cart_owner(request), product.id)
+    request.cart.invalidate()
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        carts = get_user_carts(request)
-        cart_component_html = render_to_string('carts/includes/included_cart.html',
-                                               {'carts': carts, 'request': request})
-        return JsonResponse(
-            {'message': f'"{product.name}" добавлен в корзину', 'cart_component_html': cart_component_html,
-             'total_quantity': carts.total_quantity() if carts else 0})
+        return _cart_json_response(request, f'"{product.name}" добавлен в корзину')
     return redirect(request.META.get('HTTP_REFERER'))
 
 
+@query_budget(6)
 def cart_remove(request, cart_id):
-    cart_item = get_object_or_404(Cart, id=cart_id)
-    cart_item.delete()
+    if not remove_from_cart(cart_owner(request), cart_id):
+        raise Http404('Товар не найден в корзине.')
+    request.cart.invalidate()
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        carts = get_user_carts(request)
-        cart_component_html = render_to_string('carts/includes/included_cart.html',
-                                               {'carts': carts, 'request': request})
-        return JsonResponse({'message': 'Товар удален', 'cart_component_html': cart_component_html,
-                             'total_quantity': carts.total_quantity() if carts else 0})
+        return _cart_json_response(request, 'Товар удален')
     return redirect(request.META.get('HTTP_REFERER'))
 
 
+@query_budget(6)
 def cart_change_quantity(request, cart_id):
-    cart_item = get_object_or_404(Cart, id=cart_id)
+    owner = cart_owner(request)
     if request.method == 'POST':
+        # Одно атомарное изменение в БД вместо чтения-изменения-записи
         action = request.POST.get('action')
         if action == 'increment':
-            cart_item.quantity += 1
+            increase_quantity(owner, cart_id)
         elif action == 'decrement':
-            cart_item.quantity -= 1
-
-        if cart_item.quantity <= 0:
-            cart_item.delete()
-        else:
-            cart_item.save()
+            decrease_quantity(owner, cart_id)
+        request.cart.invalidate()
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        carts = get_user_carts(request)
-        cart_component_html = render_to_string('carts/includes/included_cart.html',
-                                               {'carts': carts, 'request': request})
-        return JsonResponse({'message': 'Количество изменено', 'cart_component_html': cart_component_html,
-                             'total_quantity': carts.total_quantity() if carts else 0})
-    return redirect(request.META.get('HTTP_REFERER'))
\ No newline at end of file
+        return _cart_json_response(request, 'Количество изменено')
+    return redirect(request.META.get('HTTP_REFERER'))
@@ -0,0 +1,131 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from rest_framework.utils.urls import replace_query_param
+
+from .pagination import KeysetPaginator
+
+
+def get_requested_fields(request):
+    """
+    Набор полей из ?fields=a,b,c (sparse fieldsets) или None, если параметр не задан.
+    """
+    if request is None:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+def only_requested_fields(queryset, serializer_class, requested, required=()):
+    """
+    Sparse fieldsets на уровне SQL: queryset.only() по столбцам запрошенных полей сериализатора.
+    Поля сортировки queryset добавляются всегда - их читает курсор пагинации.
+    Источники вычисляемых полей описываются в Meta.field_sources сериализатора,
+    например {'sell_price': ('price', 'discount')}.
+    """
+    if requested is None:
+        return queryset
+    serializer_fields = serializer_class().fields
+    field_sources = getattr(serializer_class.Meta, 'field_sources', {})
+    sources = set(required) | {field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)}
+    for name in requested & set(serializer_fields):
+        sources.update(field_sources.get(name, (serializer_fields[name].source,)))
+
+    columns = set()
+    for source in sources:
+        # 'category.slug' -> category, 'get_status_display' -> status
+        source = source.split('.')[0]
+        if source.startswith('get_') and source.endswith('_display'):
+            source = source[len('get_'):-len('_display')]
+        try:
+            field = queryset.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete:
+            columns.add(field.name)
+    return queryset.only(*columns)
+
+
+class SparseFieldsetsMixin:
+    """
+    Миксин для ModelSerializer: ?fields=id,status оставляет в ответе только перечисленные поля.
+    Неизвестные имена игнорируются. Представлению стоит по тому же набору полей
+    отказаться от ненужных JOIN и prefetch (get_requested_fields).
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        # Фильтруется только сериализатор верхнего уровня (в том числе элемент списка many=True),
+        # вложенные сериализаторы отдают все свои поля
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        requested = get_requested_fields(self.context.get('request'))
+        if requested is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Курсорная пагинация DRF поверх common.pagination.KeysetPaginator: подписанный курсор,
+    стоимость страницы не зависит от глубины, без COUNT(*). Порядок берется из queryset
+    представления (id добавляется автоматически).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request))
+        self.page = paginator.get_page(request.query_params.get(self.cursor_query_param))
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Курсор страницы из ссылок next / previous.', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f'Размер страницы (не больше {self.max_page_size}).', 'schema': {'type': 'integer'},
+            },
+        ]
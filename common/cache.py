@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared_cache():
+    """
+    Общий ли кэш по умолчанию для всех воркеров. LocMemCache (по умолчанию в настройках) у каждого
+    процесса свой: версия, увеличенная одним воркером, другим не видна, поэтому то, что держится
+    на версиях (фрагменты, ETag каталога, реестр категорий), с ним кэшировать нельзя.
+    """
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def initial_version():
+    # Новая версия начинается с текущего времени в мс, а не с 1: если счетчик вытеснен
+    # из кэша, он не вернется к значению, под которым еще лежат старые записи
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """
+    Возвращает текущую версию для ключа из общего кэша (создает версию, если ее нет).
+    Версия - счетчик, который увеличивают при изменении данных; все производные ключи
+    кэша включают версию, поэтому инвалидация стоит одну операцию.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = initial_version()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """
+    Увеличивает версию ключа. Старые записи кэша перестают читаться и истекают сами.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа нет (например, кэш был очищен) - начинаем новую версию
+        cache.add(key, initial_version(), timeout=None)
+        return cache.incr(key)
@@ -0,0 +1,171 @@
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .middleware import AsyncCapableMiddleware
+
+REPLICA_ALIAS = 'replica'
+
+# Кука "клиент недавно писал": его чтения идут с основной базы, пока реплика догоняет
+PIN_COOKIE = 'db_primary'
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+# Маршрутизация текущего запроса (RoutingState); None - вне запроса, все идет в основную базу
+current_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """
+    Состояние одного запроса: разрешены ли чтения с реплики и была ли запись.
+    Объект изменяемый, поэтому запись, сделанная в потоке sync_to_async, видна всему запросу.
+    """
+    def __init__(self, pinned=False):
+        self.replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+    def track_writes(self, execute, sql, params, many, context):
+        # Запись сырым SQL (upsert корзины, сессии) мимо db_for_write тоже закрепляет основную базу
+        if not self.wrote and sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            self.wrote = self.pinned = True
+        return execute(sql, params, many, context)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def read_replica(view_func):
+    """
+    Декоратор функции-представления: чтения GET-запроса можно выполнять на реплике
+    (для классов - атрибут read_replica = True), см. ReplicaRoutingMiddleware.
+    """
+    view_func.read_replica = True
+    return view_func
+
+
+def uses_replica(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return getattr(view_func, 'read_replica', getattr(view_class, 'read_replica', False))
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтения внутри блока идут на реплику, если она настроена и запрос еще ничего не писал.
+    """
+    state = current_state.get()
+    if state is None:
+        yield
+        return
+    previous, state.replica = state.replica, True
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+@contextmanager
+def wrap_connections(wrapper, *aliases):
+    """
+    connection.execute_wrapper на подключениях aliases (по умолчанию - на всех) на время блока.
+    """
+    with ExitStack() as stack:
+        for alias in aliases or connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+@asynccontextmanager
+async def awrap_connections(wrapper, *aliases):
+    """
+    wrap_connections для асинхронного кода. Подключения к БД принадлежат потоку: под ASGI
+    ORM (и async-методы QuerySet) выполняет запросы в потоке sync_to_async, общем для
+    всего запроса, поэтому обертки ставятся и снимаются там же.
+    """
+    stack = ExitStack()
+    await sync_to_async(stack.enter_context)(wrap_connections(wrapper, *aliases))
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтения - на реплику только там, где это разрешено (read_replica у представления или
+    блок replica_reads), и только пока запрос и клиент ничего не писали. Запись и все
+    остальное - в основную базу. Миграции выполняются только в основной базе:
+    реплика получает схему репликацией.
+    """
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is not None and state.replica and not state.pinned and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы: объекты из обеих связываются свободно
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Включает чтения с реплики для GET/HEAD-запросов к представлениям с read_replica.
+    После записи запрос до конца читает из основной базы, а клиент получает куку
+    db_primary на DATABASE_REPLICA_PIN_SECONDS секунд - следующие запросы тоже
+    читают свои изменения из основной базы, пока реплика их не получила.
+    Без реплики в DATABASES ничего не делает.
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_state.get()
+        if state is not None and request.method in ('GET', 'HEAD') and uses_replica(view_func):
+            state.replica = True
+
+    def handle(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_state.set(state)
+        try:
+            with wrap_connections(state.track_writes, DEFAULT_DB_ALIAS):
+                response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+
+        # Состояние - изменяемый объект в ContextVar: его видят и потоки sync_to_async
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_state.set(state)
+        try:
+            async with awrap_connections(state.track_writes, DEFAULT_DB_ALIAS):
+                response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.pin(response, state)
+
+    @staticmethod
+    def pin(response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
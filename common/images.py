@@ -0,0 +1,152 @@
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+# Ширины производных изображений (px). Больше оригинала не увеличиваем.
+DERIVATIVE_WIDTHS = (160, 320, 480, 640, 960)
+
+# Форматы от самого компактного: браузер берет первый поддерживаемый <source>.
+# AVIF - только если Pillow собран с его поддержкой.
+DERIVATIVE_FORMATS = tuple(
+    fmt for fmt in ('avif', 'webp') if features.check(fmt)
+)
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 4},
+}
+
+DERIVATIVES_DIR = '_derivatives'
+CACHE_KEY = 'images:derivatives:{name}'
+# Метка "генерация уже запущена" - повторные сохранения модели не ставят задачу снова
+PENDING_KEY = 'images:pending:{name}'
+# Пока производных нет (генерация идет в фоне), пустой результат кэшируется ненадолго
+MISSING_TIMEOUT = 60
+
+
+def derivative_name(name, width, fmt):
+    """
+    products_images/iphone.png -> products_images/_derivatives/iphone/320.webp
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, DERIVATIVES_DIR, stem, f'{width}.{fmt}')
+
+
+def generate_derivatives(name, widths=DERIVATIVE_WIDTHS, formats=DERIVATIVE_FORMATS, force=False):
+    """
+    Создает производные изображения name (путь в default_storage) всех ширин и форматов.
+    Существующие файлы пропускаются, если не задан force. Работает без БД,
+    поэтому годится для пула процессов. Возвращает {формат: [ширины]}.
+    """
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    # Ширины меньше оригинала плюс сам оригинал (в компактном формате), если он меньше максимальной
+    targets = sorted({width for width in widths if width < image.width} | {min(image.width, max(widths))})
+    result = {}
+    for fmt in formats:
+        result[fmt] = []
+        for width in targets:
+            target = derivative_name(name, width, fmt)
+            if force or not default_storage.exists(target):
+                height = round(image.height * width / image.width)
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, format=fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+                if force and default_storage.exists(target):
+                    default_storage.delete(target)
+                default_storage.save(target, ContentFile(buffer.getvalue()))
+            result[fmt].append(width)
+    return result
+
+
+def get_derivatives(name):
+    """
+    Доступные производные изображения: {формат: [ширины]} или {}, если их еще нет.
+    Результат кэшируется, поэтому страница со списком товаров не проверяет файлы при каждом показе.
+    """
+    key = CACHE_KEY.format(name=name)
+    derivatives = cache.get(key)
+    if derivatives is None:
+        derivatives = _scan_derivatives(name)
+        cache.set(key, derivatives, timeout=None if derivatives else MISSING_TIMEOUT)
+    return derivatives
+
+
+def _scan_derivatives(name):
+    directory = posixpath.dirname(derivative_name(name, 0, 'x'))
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return {}
+    derivatives = {}
+    for filename in files:
+        width, _, fmt = filename.partition('.')
+        if width.isdigit() and fmt in DERIVATIVE_FORMATS:
+            derivatives.setdefault(fmt, []).append(int(width))
+    return {fmt: sorted(widths) for fmt, widths in derivatives.items()}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Пул создается при первой загрузке изображения. spawn, а не fork: дочерний процесс
+    # не наследует соединения с БД и потоки воркера, Django настраивается заново.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def schedule_derivatives(name, on_ready=None):
+    """
+    Ставит генерацию производных в пул процессов; по готовности обновляет кэш текущего процесса
+    и вызывает on_ready - например, сбрасывает закэшированные фрагменты, отрисованные
+    без производных.
+    """
+    if not cache.add(PENDING_KEY.format(name=name), True, timeout=600):
+        return
+
+    def done(future):
+        cache.delete(PENDING_KEY.format(name=name))
+        if future.exception() is None:
+            cache.set(CACHE_KEY.format(name=name), future.result(), timeout=None)
+            if on_ready is not None:
+                on_ready()
+
+    _get_executor().submit(generate_derivatives, name).add_done_callback(done)
+
+
+def ensure_derivatives(image, on_ready=None):
+    """
+    Для обработчиков post_save: после коммита запускает генерацию, если у файла еще нет производных.
+    on_ready вызывается в потоке пула, когда производные готовы (см. schedule_derivatives).
+    """
+    if image and not get_derivatives(image.name):
+        name = image.name
+        transaction.on_commit(lambda: schedule_derivatives(name, on_ready))
@@ -0,0 +1,69 @@
+import hmac
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .profiling import query_budget
+
+# Все объявленные счетчики в порядке создания (для /metrics/)
+REGISTRY = []
+
+
+class Counter:
+    """
+    Счетчик в общем кэше: значения суммируются по всем воркерам и отдаются /metrics/
+    в текстовом формате Prometheus. Значения метки объявляются заранее, чтобы
+    страница метрик читала все серии одним get_many.
+    """
+    def __init__(self, name, documentation, label=None, values=()):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.values = tuple(values)
+        REGISTRY.append(self)
+
+    def key(self, value=None):
+        return f'metrics:{self.name}:{value}' if self.label else f'metrics:{self.name}'
+
+    def inc(self, value=None, amount=1):
+        key = self.key(value)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Счетчика еще нет (или кэш очищен) - начинаем заново; add не затирает параллельный
+            if not cache.add(key, amount, timeout=None):
+                cache.incr(key, amount)
+
+    def collect(self):
+        """
+        Серии счетчика: [(значение метки или None, число)].
+        """
+        series = list(self.values) if self.label else [None]
+        counts = cache.get_many([self.key(value) for value in series])
+        return [(value, counts.get(self.key(value), 0)) for value in series]
+
+
+def render_metrics():
+    lines = []
+    for counter in REGISTRY:
+        lines.append(f'# HELP {counter.name} {counter.documentation}')
+        lines.append(f'# TYPE {counter.name} counter')
+        for value, count in counter.collect():
+            labels = f'{{{counter.label}="{value}"}}' if counter.label else ''
+            lines.append(f'{counter.name}{labels} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+@query_budget(3)
+def metrics_view(request):
+    """
+    Счетчики для Prometheus. Доступ: заголовок Authorization: Bearer <METRICS_TOKEN>
+    или сессия сотрудника (is_staff).
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    authorized = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,249 @@
+import datetime
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'common.pagination.cursor'
+
+# Ниже этого порога оценка планировщика неточна, а точный COUNT(*) дешев
+ESTIMATE_THRESHOLD = 1000
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк по статистике планировщика PostgreSQL (EXPLAIN, без выполнения запроса).
+    Для других СУБД и для небольших выборок возвращает точный COUNT(*).
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+    if estimate < ESTIMATE_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Обычный постраничный Paginator, но count берется из оценки планировщика
+    вместо COUNT(*) по всей отфильтрованной выборке.
+    """
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации. Интерфейс близок к django.core.paginator.Page,
+    но вместо номеров страниц содержит подписанные курсоры соседних страниц.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def estimated_count(self):
+        return self.paginator.estimated_count
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) пагинация: вместо OFFSET страница начинается условием
+    "строго после последней показанной строки" по ключу сортировки и id.
+    Стоимость любой страницы одинакова, COUNT(*) не выполняется.
+
+    Курсор - подписанный (django.core.signing) набор значений ключа сортировки
+    и направление, поэтому клиент не может подменить условие выборки.
+    """
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = self._get_ordering(object_list)
+
+    @staticmethod
+    def _get_ordering(queryset):
+        query = queryset.query
+        ordering = list(query.order_by or (query.get_meta().ordering if query.default_ordering else ()))
+        for field in ordering:
+            if not isinstance(field, str):
+                raise ValueError('KeysetPaginator поддерживает сортировку только по именам полей и аннотаций.')
+        # id - обязательный уникальный ключ, разрешающий равенство значений сортировки
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        return ordering
+
+    @cached_property
+    def estimated_count(self):
+        return estimate_count(self.object_list)
+
+    def encode_cursor(self, obj, direction):
+        values = [self._dump_value(self._get_value(obj, field.lstrip('-'))) for field in self.ordering]
+        return signing.dumps({'v': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if len(payload.get('v', ())) != len(self.ordering) or payload.get('d') not in ('n', 'p'):
+            return None
+        return payload
+
+    def get_page(self, cursor=None):
+        """
+        Возвращает страницу после (или перед) курсором. Неверный курсор - первая страница.
+        """
+        queryset, payload, backwards = self._page_query(cursor)
+        return self._build_page(list(queryset), payload, backwards)
+
+    async def aget_page(self, cursor=None):
+        """
+        get_page для асинхронных представлений: строки читаются асинхронной итерацией QuerySet.
+        """
+        queryset, payload, backwards = self._page_query(cursor)
+        return self._build_page([obj async for obj in queryset], payload, backwards)
+
+    def _page_query(self, cursor):
+        payload = self.decode_cursor(cursor) if cursor else None
+        backwards = payload is not None and payload['d'] == 'p'
+
+        ordering = [self._reverse(field) for field in self.ordering] if backwards else self.ordering
+        queryset = self.object_list.order_by(*ordering)
+        if payload is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, payload['v']))
+        return queryset[:self.per_page + 1], payload, backwards
+
+    def _build_page(self, rows, payload, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, self)
+
+        if backwards:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, payload is not None
+
+        return KeysetPage(
+            rows, self,
+            next_cursor=self.encode_cursor(rows[-1], 'n') if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'p') if has_previous else None,
+        )
+
+    @staticmethod
+    def _seek_filter(ordering, values):
+        # (a, b, id) > (va, vb, vid) с учетом направления каждого поля:
+        # a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND id > vid)
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _get_value(obj, name):
+        for part in name.split('__'):
+            obj = getattr(obj, 'pk' if part == 'pk' else part)
+        return obj
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView: опциональный режим keyset-пагинации и оценка числа строк.
+
+    - pagination_mode = 'keyset' включает курсоры для всех запросов представления;
+      иначе режим включается клиентом параметром ?cursor= (пустой курсор - первая страница).
+    - estimate_count = True заменяет COUNT(*) обычной пагинации оценкой планировщика.
+    """
+    pagination_mode = 'page'
+    cursor_kwarg = 'cursor'
+    estimate_count = False
+
+    def use_keyset_pagination(self):
+        return self.pagination_mode == 'keyset' or self.cursor_kwarg in self.request.GET
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        paginator_class = EstimatedCountPaginator if self.estimate_count else self.paginator_class
+        return paginator_class(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        paginate_queryset для асинхронных представлений: COUNT(*) (или оценка) и строки
+        страницы читаются через async-API QuerySet, object_list страницы - готовый список.
+        """
+        if self.use_keyset_pagination():
+            paginator = KeysetPaginator(queryset, page_size)
+            page = await paginator.aget_page(self.request.GET.get(self.cursor_kwarg))
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(), allow_empty_first_page=self.get_allow_empty(),
+        )
+        # count - cached_property: дальше paginator.page() не обращается к БД
+        if self.estimate_count:
+            paginator.count = await sync_to_async(estimate_count)(queryset)
+        else:
+            paginator.count = await queryset.acount()
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page = paginator.page(paginator.num_pages if page_number == 'last' else int(page_number))
+        except (ValueError, InvalidPage):
+            raise Http404(f'Неверный номер страницы: {page_number}')
+        page.object_list = [obj async for obj in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
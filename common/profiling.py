@@ -0,0 +1,284 @@
+import hmac
+import logging
+import random
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Template
+from django.template.library import InclusionNode, SimpleNode
+
+from .db import awrap_connections, wrap_connections
+from .middleware import AsyncCapableMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Профиль текущего запроса; None - профилирование выключено и обертки ничего не делают
+current_profile = ContextVar('render_profile', default=None)
+
+PROFILE_HEADER = 'X-Profile-Templates'
+
+
+class RenderProfile:
+    """
+    Время отрисовки и число SQL-запросов по шаблонам и тегам за один запрос.
+    total - время с вложенными шаблонами, self - без них; запросы считаются "свои",
+    то есть выполненные непосредственно в этом шаблоне или теге.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.stack = []
+        self.queries = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def measure(self, kind, name):
+        frame = {'time': 0.0, 'queries': 0}
+        self.stack.append(frame)
+        started = time.perf_counter()
+        queries = self.queries
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            executed = self.queries - queries
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1]['time'] += elapsed
+                self.stack[-1]['queries'] += executed
+            entry = self.entries.setdefault((kind, name), {'calls': 0, 'total': 0.0, 'self': 0.0, 'queries': 0})
+            entry['calls'] += 1
+            entry['total'] += elapsed
+            entry['self'] += elapsed - frame['time']
+            entry['queries'] += executed - frame['queries']
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def top(self, limit):
+        return sorted(self.entries.items(), key=lambda item: item[1]['self'], reverse=True)[:limit]
+
+
+def _profiled(kind, get_name, render):
+    def wrapper(self, context):
+        profile = current_profile.get()
+        if profile is None:
+            return render(self, context)
+        with profile.measure(kind, get_name(self)):
+            return render(self, context)
+    return wrapper
+
+
+def _tag_name(node):
+    return '{}.{}'.format(node.func.__module__.rsplit('.', 1)[-1], node.func.__name__)
+
+
+def install():
+    """
+    Оборачивает отрисовку шаблонов и тегов (simple_tag, inclusion_tag). Вызывается один раз
+    при создании middleware; вне профилируемого запроса обертка - одно чтение ContextVar.
+    """
+    if getattr(Template._render, 'profiled', False):
+        return
+    for cls, kind, get_name, method in (
+        (Template, 'template', lambda template: template.origin.template_name or template.name, '_render'),
+        (InclusionNode, 'tag', _tag_name, 'render'),
+        (SimpleNode, 'tag', _tag_name, 'render'),
+    ):
+        wrapper = _profiled(kind, get_name, getattr(cls, method))
+        wrapper.profiled = True
+        setattr(cls, method, wrapper)
+
+
+class TemplateProfilerMiddleware(AsyncCapableMiddleware):
+    """
+    Профилирует отрисовку шаблонов: доля запросов TEMPLATE_PROFILER_SAMPLE_RATE или запрос
+    с заголовком X-Profile-Templates: 1 от сотрудника (или с Bearer METRICS_TOKEN).
+    Результат - заголовок Server-Timing (виден в DevTools) и строка в логе common.profiling.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        install()
+
+    def should_profile(self, request, user):
+        # user - ленивый request.user или уже загруженный await request.auser()
+        if request.headers.get(PROFILE_HEADER) == '1':
+            token = settings.METRICS_TOKEN
+            authorization = request.headers.get('Authorization', '')
+            if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+                return True
+            return user.is_staff
+        return random.random() < settings.TEMPLATE_PROFILER_SAMPLE_RATE
+
+    def handle(self, request):
+        if not self.should_profile(request, request.user):
+            return self.get_response(request)
+
+        profile = RenderProfile()
+        token = current_profile.set(profile)
+        try:
+            with wrap_connections(profile.count_query):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        user = await request.auser() if request.headers.get(PROFILE_HEADER) == '1' else None
+        if not self.should_profile(request, user):
+            return await self.get_response(request)
+
+        profile = RenderProfile()
+        token = current_profile.set(profile)
+        try:
+            async with awrap_connections(profile.count_query):
+                response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    @staticmethod
+    def report(request, response, profile):
+        elapsed = time.perf_counter() - profile.started
+        top = profile.top(settings.TEMPLATE_PROFILER_TOP)
+        response.headers['Server-Timing'] = ', '.join(
+            [f'total;dur={elapsed * 1000:.1f}'] + [
+                f'{kind}{i};desc="{name}";dur={entry["self"] * 1000:.1f}'
+                for i, ((kind, name), entry) in enumerate(top, 1)
+            ]
+        )
+        logger.info(
+            '%s %s: %.1f мс, SQL-запросов %d; %s', request.method, request.path, elapsed * 1000, profile.queries,
+            '; '.join(
+                f'{name} x{entry["calls"]} {entry["total"] * 1000:.1f} мс (свое {entry["self"] * 1000:.1f} мс, '
+                f'SQL {entry["queries"]})'
+                for (kind, name), entry in top
+            ),
+        )
+        return response
+
+
+# Списки параметров разной длины - одна и та же "форма" запроса: IN (%s, %s) ~ IN (%s)
+PARAMS_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+VALUES_LIST_RE = re.compile(r'(\([^()]*\))(?:, \1)+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """
+    Декоратор функции-представления: допустимое число SQL-запросов (для классов -
+    атрибут query_budget), см. QueryBudgetMiddleware.
+    """
+    def decorator(view_func):
+        view_func.query_budget = budget
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    # as_view() оставляет ссылку на класс: view_class (Django) или cls (наборы DRF)
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return getattr(view_func, 'query_budget', getattr(view_class, 'query_budget', None))
+
+
+def view_name(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None) or view_func
+    return f'{view_class.__module__}.{view_class.__qualname__}'
+
+
+def query_shape(sql):
+    return VALUES_LIST_RE.sub(r'\1', PARAMS_LIST_RE.sub('(%s)', sql))
+
+
+def _caller():
+    # Первая строка кода проекта (не Django и не этот модуль), откуда пришел запрос
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(str(settings.BASE_DIR)) and frame.filename != __file__ \
+                and '/site-packages/' not in frame.filename:
+            return f'{frame.filename[len(str(settings.BASE_DIR)) + 1:]}:{frame.lineno} {frame.name}'
+    return 'неизвестно'
+
+
+class QueryStats:
+    """
+    Запросы одного HTTP-запроса: число, суммарное время и повторы одинаковых по форме
+    запросов (признак N+1). Для повторяющейся формы запоминается место в коде.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.callers = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.threshold:
+            self.callers[shape] = _caller()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+    def repeated(self):
+        return [(shape, count, self.callers[shape]) for shape, count in self.shapes.items() if count >= self.threshold]
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Считает SQL-запросы и время БД за запрос. Нарушение - превышение query_budget
+    представления или N+1 (одинаковый по форме запрос QUERY_REPEAT_THRESHOLD раз и больше).
+    QUERY_BUDGET_ACTION: 'log' - предупреждение в логе common.profiling, 'raise' -
+    исключение QueryBudgetExceeded (для разработки и проверки check_query_budgets), 'off'.
+    """
+    def handle(self, request):
+        if settings.QUERY_BUDGET_ACTION == 'off':
+            return self.get_response(request)
+
+        stats = QueryStats(settings.QUERY_REPEAT_THRESHOLD)
+        with wrap_connections(stats):
+            response = self.get_response(request)
+        return self.check(request, response, stats)
+
+    async def __acall__(self, request):
+        if settings.QUERY_BUDGET_ACTION == 'off':
+            return await self.get_response(request)
+
+        stats = QueryStats(settings.QUERY_REPEAT_THRESHOLD)
+        async with awrap_connections(stats):
+            response = await self.get_response(request)
+        return self.check(request, response, stats)
+
+    @staticmethod
+    def check(request, response, stats):
+        timing = f'db;desc="SQL x{stats.count}";dur={stats.duration * 1000:.1f}'
+        server_timing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{server_timing}, {timing}' if server_timing else timing
+
+        # Представление, до которого дошел запрос (нет, если маршрут не найден)
+        view_func = getattr(getattr(request, 'resolver_match', None), 'func', None)
+        if view_func is None:
+            return response
+        problems = []
+        budget = get_query_budget(view_func)
+        if budget is not None and stats.count > budget:
+            problems.append(f'{stats.count} SQL-запросов при бюджете {budget}')
+        for shape, count, caller in stats.repeated():
+            problems.append(f'N+1: {count} одинаковых запросов из {caller}: {shape[:200]}')
+        if problems:
+            message = '{} {} ({}): {}'.format(request.method, request.path, view_name(view_func), '; '.join(problems))
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,193 @@
+import functools
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import available_encodings
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Хэшированные имена не меняют содержимого - браузер и CDN хранят их год без перепроверки
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хэша в имени (favicon, ссылки из site.webmanifest) - с перепроверкой по ETag
+STATIC_CACHE_CONTROL = 'public, max-age=3600'
+
+
+class FileRange:
+    """
+    Обертка файла для ответа на Range: отдает не больше length байт с текущей позиции.
+    fileno() и позиция проходят насквозь, поэтому gunicorn отправляет диапазон через sendfile
+    (offset - позиция файла, count - Content-Length ответа) без копирования в память процесса.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def parse_range(header, size):
+    """
+    Один диапазон из заголовка Range: (начало, конец включительно), None - заголовок
+    не поддерживается (отдается весь файл), ValueError - диапазон вне файла (416).
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500 - последние 500 байт
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def serve_file(request, document_root, path, cache_control, precompressed=False):
+    """
+    Отдает файл из document_root: условные запросы (ETag, Last-Modified -> 304), Range (206),
+    заранее сжатые копии .br/.gz (CompressedManifestStaticFilesStorage) по Accept-Encoding.
+    Тело отдается как файл (FileResponse), поэтому под gunicorn используется sendfile.
+    """
+    try:
+        fullpath = Path(safe_join(document_root, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+
+    content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+    encoding = None
+    vary = False
+    # Диапазон относится к исходным байтам, поэтому Range всегда отдается из несжатого файла
+    if precompressed and 'Range' not in request.headers:
+        accepted = accepted_encodings(request)
+        for candidate, suffix in available_encodings():
+            compressed = fullpath.with_name(fullpath.name + suffix)
+            if compressed.is_file():
+                vary = True
+                if candidate in accepted:
+                    fullpath, encoding = compressed, candidate
+                    break
+
+    stat = fullpath.stat()
+    etag = '"{:x}-{:x}{}"'.format(int(stat.st_mtime), stat.st_size, f'-{encoding}' if encoding else '')
+    headers = {
+        'Cache-Control': cache_control,
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+    if vary:
+        headers['Vary'] = 'Accept-Encoding'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers['Range'], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    file = fullpath.open('rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type, filename=Path(path).name)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type,
+                                filename=Path(path).name)
+        response.headers['Content-Length'] = end - start + 1
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    for header, value in headers.items():
+        response.headers[header] = value
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def if_range_matches(request, etag, mtime):
+    # If-Range: диапазон отдается, только если файл не изменился; иначе - весь файл
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+@functools.cache
+def immutable_static_names():
+    # Имена с хэшем из манифеста collectstatic (staticfiles.json)
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def serve_static(request, path):
+    """
+    Статика из STATIC_ROOT (после collectstatic) без отдельного веб-сервера.
+    """
+    cache_control = IMMUTABLE_CACHE_CONTROL if path in immutable_static_names() else STATIC_CACHE_CONTROL
+    return serve_file(request, settings.STATIC_ROOT, path, cache_control, precompressed=True)
+
+
+def serve_media(request, path):
+    """
+    Медиафайлы. Если задан MEDIA_ACCEL_REDIRECT, файл отдает nginx (X-Accel-Redirect:
+    internal location с тем же деревом файлов) - процесс Django только проверяет путь.
+    """
+    if settings.MEDIA_ACCEL_REDIRECT:
+        try:
+            safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404
+        response = HttpResponse(content_type='')
+        response.headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(path)
+        response.headers['Cache-Control'] = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        return response
+    return serve_file(request, settings.MEDIA_ROOT, path, f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}')
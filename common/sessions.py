@@ -0,0 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache.backends.locmem import LocMemCache
+
+# Изменения этих ключей (вход, выход, смена пароля) пишутся в БД сразу
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+def _auth(data):
+    return tuple(data.get(key) for key in AUTH_KEYS)
+
+
+class SessionStore(CachedDBStore):
+    """
+    Сессии в кэше с отложенной записью в БД (SESSION_ENGINE = 'common.sessions').
+    Чтение - из кэша (таблица django_session только при промахе), запись - в кэш, а в БД
+    не чаще раза в SESSION_WRITE_BEHIND_INTERVAL секунд на сессию. Создание сессии и
+    изменение данных входа пишутся в БД сразу, поэтому потеря кэша не разлогинит
+    пользователя; теряются только прочие изменения последнего интервала.
+    С LocMemCache (кэш своего процесса) запись сквозная: воркеры не видят кэш друг друга.
+    """
+    _loaded_auth = _auth({})
+
+    @property
+    def persisted_key(self):
+        # Пока ключ жив, очередная запись в БД не нужна
+        return f'{self.cache_key}:persisted'
+
+    def write_behind(self):
+        return settings.SESSION_WRITE_BEHIND_INTERVAL > 0 and not isinstance(self._cache, LocMemCache)
+
+    def load(self):
+        data = super().load()
+        self._loaded_auth = _auth(data)
+        return data
+
+    async def aload(self):
+        # request.auser() в асинхронных представлениях загружает сессию этим методом
+        data = await super().aload()
+        self._loaded_auth = _auth(data)
+        return data
+
+    def save(self, must_create=False):
+        if not self.write_behind() or self.session_key is None:
+            # Новая сессия: create() вызовет save(must_create=True)
+            return super().save(must_create)
+
+        interval = settings.SESSION_WRITE_BEHIND_INTERVAL
+        if must_create or _auth(self._get_session()) != self._loaded_auth:
+            # Сквозная запись; с нее же начинается новый интервал
+            super().save(must_create)
+            self._cache.set(self.persisted_key, True, interval)
+        elif self._cache.add(self.persisted_key, True, interval):
+            # Интервал истек - переносим накопленные изменения в БД
+            try:
+                super().save()
+            except UpdateError:
+                # Строку уже удалил clearsessions (в БД срок истекает раньше, чем в кэше)
+                super().save(must_create=True)
+        else:
+            self._cache.set(self.cache_key, self._get_session(), self.get_expiry_age())
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        session_key = session_key or self.session_key
+        if session_key:
+            self._cache.delete(f'{self.cache_key_prefix}{session_key}:persisted')
@@ -0,0 +1,119 @@
+import sys
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from .profiling import QueryBudgetExceeded, get_query_budget, view_name
+
+
+def iter_named_urls(patterns=None, namespace=''):
+    """
+    Все именованные маршруты корневого URLconf: (полное имя с пространством имен, URLPattern).
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from iter_named_urls(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}', pattern
+
+
+def is_project_view(view_func):
+    # Представления проекта (не Django, DRF и других библиотек) обязаны объявить бюджет
+    module = sys.modules.get(view_name(view_func).rsplit('.', 1)[0])
+    return bool(module and getattr(module, '__file__', '').startswith(str(settings.BASE_DIR)))
+
+
+def iter_view_paths(sample_kwargs, skip_namespaces=('admin',), last=('users:logout',)):
+    """
+    (имя, путь, представление) для каждого именованного маршрута core/urls.py.
+    sample_kwargs(имя маршрута, имя параметра) возвращает значение параметра URL
+    (например, slug существующего товара). Маршруты last (выход из аккаунта) идут
+    в конце, чтобы не разлогинить клиента до остальных.
+    """
+    urls = sorted(iter_named_urls(), key=lambda item: item[0] in last)
+    for name, pattern in urls:
+        if name.split(':')[0] in skip_namespaces:
+            continue
+        kwargs = {key: sample_kwargs(name, key) for key in pattern.pattern.regex.groupindex}
+        yield name, reverse(name, kwargs=kwargs), pattern.callback
+
+
+def check_query_budgets(client, sample_kwargs, skip_namespaces=('admin',), last=('users:logout',)):
+    """
+    GET на каждый маршрут (iter_view_paths) с QUERY_BUDGET_ACTION='raise'. Ошибка - превышение
+    бюджета, N+1 или представление проекта без query_budget. Возвращает отчет
+    [(имя, путь, статус, запросов, бюджет)] и список ошибок.
+    """
+    report = []
+    failures = []
+    for name, path, view_func in iter_view_paths(sample_kwargs, skip_namespaces, last):
+        budget = get_query_budget(view_func)
+        if budget is None and is_project_view(view_func):
+            failures.append(f'{name}: у {view_name(view_func)} не объявлен query_budget')
+
+        with override_settings(QUERY_BUDGET_ACTION='raise'), CaptureQueriesContext(connection) as queries:
+            try:
+                # Referer - для представлений корзины, которые возвращают на предыдущую страницу
+                status = client.get(path, HTTP_REFERER='/').status_code
+            except QueryBudgetExceeded as e:
+                status = 'превышен бюджет'
+                failures.append(str(e))
+        report.append((name, path, status, len(queries), budget))
+
+    return report, failures
+
+
+def capture_view_queries(client, sample_kwargs, skip_namespaces=('admin',), last=('users:logout',)):
+    """
+    SQL, который выполняет GET на каждый маршрут: [(имя, путь, статус, [sql, ...])].
+    Параметры уже подставлены в текст запроса - его можно передать в EXPLAIN.
+    """
+    result = []
+    for name, path, view_func in iter_view_paths(sample_kwargs, skip_namespaces, last):
+        with CaptureQueriesContext(connection) as queries:
+            status = client.get(path, HTTP_REFERER='/').status_code
+        result.append((name, path, status, [query['sql'] for query in queries.captured_queries]))
+    return result
+
+
+def assert_query_budgets(client, sample_kwargs, skip_namespaces=('admin',), last=('users:logout',)):
+    """
+    Хелпер для тестов: check_query_budgets с AssertionError при любой ошибке.
+    """
+    report, failures = check_query_budgets(client, sample_kwargs, skip_namespaces, last)
+    if failures:
+        raise AssertionError('\n'.join(failures))
+    return report
+
+
+def run_concurrently(threads, iterations, operation):
+    """
+    threads потоков одновременно (барьер) выполняют operation по iterations раз.
+    Возвращает исключения из потоков.
+    """
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker():
+        try:
+            barrier.wait()
+            for _ in range(iterations):
+                operation()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # У каждого потока свое соединение с БД
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return errors
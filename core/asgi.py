@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
+from core.warmup import warm_process
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 application = get_asgi_application()
+
+# Шаблоны и маршруты компилируются при старте процесса (с gunicorn --preload - в мастере,
+# до fork), а не на первых запросах. Соединения с БД прогревает gunicorn.conf.py в воркерах
+if settings.TEMPLATE_WARMUP:
+    warm_process()
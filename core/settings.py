@@ -10,14 +10,24 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# Платежный шлюз воркера outbox (orders.payments.GATEWAYS): stripe или fake - локальная замена Stripe
+PAYMENT_GATEWAY = os.getenv('PAYMENT_GATEWAY', 'stripe')
+# Сколько секунд товар неоплаченного заказа остается в резерве. Платежная сессия Stripe живет столько же,
+# но не меньше часа от отправки (orders.services.session_expires_at)
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', 60 * 60))
+# Резерв заказа с отложенной оплатой (банковский перевод, SEPA): сессия завершена, деньги придут позже
+DELAYED_PAYMENT_RESERVATION_TTL = int(os.getenv('DELAYED_PAYMENT_RESERVATION_TTL', 14 * 24 * 60 * 60))
 YOUR_DOMAIN = 'http://127.0.0.1:8000'
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +55,9 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
+    "rest_framework",
+    "drf_spectacular",
 
     'pages.apps.PagesConfig',
     'products.apps.ProductsConfig',
@@ -55,10 +68,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    'common.db.ReplicaRoutingMiddleware',
+    'common.profiling.QueryBudgetMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    'common.profiling.TemplateProfilerMiddleware',
+    'carts.middleware.CartMiddleware',
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -69,8 +86,15 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / 'templates'],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Скомпилированные шаблоны хранятся в памяти процесса (при DEBUG кэш
+            # сбрасывается автоперезагрузкой при изменении файлов)
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
@@ -82,8 +106,27 @@ TEMPLATES = [
     },
 ]
 
+# Прогрев при старте процесса (core/wsgi.py, core/asgi.py): шаблоны проекта, маршруты, хранилища (core.warmup)
+TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', str(not DEBUG)) == 'True'
+
+# Профилирование отрисовки (common.profiling): доля профилируемых запросов (0 - только
+# по заголовку X-Profile-Templates: 1 от сотрудника) и число строк в отчете
+TEMPLATE_PROFILER_SAMPLE_RATE = float(os.getenv('TEMPLATE_PROFILER_SAMPLE_RATE', 0))
+TEMPLATE_PROFILER_TOP = 10
+
+# Бюджет SQL-запросов представлений (атрибут query_budget) и поиск N+1 (common.profiling):
+# 'raise' - исключение, 'log' - предупреждение в логе, 'off' - выключено
+QUERY_BUDGET_ACTION = os.getenv('QUERY_BUDGET_ACTION', 'log')
+# Сколько одинаковых по форме запросов за один HTTP-запрос считать N+1
+QUERY_REPEAT_THRESHOLD = 5
+
 WSGI_APPLICATION = "core.wsgi.application"
 
+# Асинхронные представления каталога и корзины (products.async_views, carts.async_views).
+# Включать при запуске под ASGI: gunicorn.conf.py тогда сам берет core.asgi и воркеры uvicorn.
+# Под WSGI они выполняются в отдельном цикле событий на каждый запрос и только медленнее
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -99,9 +142,97 @@ DATABASES = {
         'OPTIONS': {
             'client_encoding': 'UTF8',
         },
+        # Постоянные соединения: одно на поток воркера, живет столько секунд между запросами
+        # и проверяется перед повторным использованием (разрыв после рестарта БД не дойдет до запроса).
+        # Под ASGI ORM работает в потоках, которые живут один запрос: постоянные соединения
+        # не переиспользуются и копятся до лимита max_connections, поэтому там - 0 (или пул ниже)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Пул соединений psycopg 3 (psycopg[binary,pool] из requirements.txt). Нужен под ASGI,
+# где постоянные соединения не переиспользуются.
+# DB_POOL_MAX_SIZE > 0 включает пул; с пулом CONN_MAX_AGE должен быть 0.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+if DB_POOL_MAX_SIZE:
+    if find_spec('psycopg_pool') is None:
+        # Иначе ошибка всплыла бы только при первом подключении к БД
+        raise ImproperlyConfigured('DB_POOL_MAX_SIZE требует psycopg 3 с пулом: pip install "psycopg[binary,pool]"')
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': DB_POOL_MAX_SIZE,
+        # Сколько секунд запрос ждет свободное соединение, прежде чем получить ошибку
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        # Проверку соединения при выдаче из пула (check) Django включает сам по CONN_HEALTH_CHECKS
+    }
+
+# Реплика для чтений каталога (common.db.PrimaryReplicaRouter). Для локальной проверки
+# достаточно копии базы: createdb -T ios_app_db ios_app_db_replica, затем
+# DB_REPLICA_NAME=ios_app_db_replica python manage.py check_replica_routing
+if os.getenv('DB_REPLICA_NAME') or os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        # Тесты пишут и читают одну тестовую базу
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['common.db.PrimaryReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной базы (с запасом на задержку репликации)
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# В продакшене укажите общий кэш для всех воркеров (Memcached/Redis) через переменные окружения.
+# С LocMemCache (у каждого воркера свой) кэш фрагментов и ETag каталога отключены (common.cache.is_shared_cache),
+# manage.py check --deploy об этом предупреждает (products.W001).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'iostrade'),
+    }
+}
+
+# Сессии: 'common.sessions' - кэш с отложенной записью в БД (по умолчанию) или
+# 'django.contrib.sessions.backends.signed_cookies' - подписанные куки, без хранения на сервере.
+# Аноним без корзины и без входа сессию не получает - каталог не обращается к хранилищу сессий.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'common.sessions')
+# Изменения сессии (кроме входа и выхода) пишутся в БД не чаще раза в столько секунд; 0 - сразу
+SESSION_WRITE_BEHIND_INTERVAL = int(os.getenv('SESSION_WRITE_BEHIND_INTERVAL', 5 * 60))
+
+# Корзина анонима (carts.storage): 'cache' - в общем кэше по токену из сессии,
+# 'session' - в самой сессии (с signed_cookies - целиком в куке). В БД - только после входа.
+# С LocMemCache (кэш по умолчанию, у каждого воркера свой) 'cache' работает как 'session'.
+ANONYMOUS_CART_STORAGE = os.getenv('ANONYMOUS_CART_STORAGE', 'cache')
+
+# Время жизни фрагментов шаблонов (карточки товаров). Актуальность обеспечивают версии
+# в ключах, срок лишь ограничивает память под редко показываемые фрагменты.
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Токен для /metrics/ (Authorization: Bearer <токен>). Без него метрики видны только сотрудникам.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+# Логи: отчеты профилировщика шаблонов (common.profiling) - в консоль
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'common.profiling': {'handlers': ['console'], 'level': 'INFO'},
+        'orders.services': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,10 +270,36 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# collectstatic собирает сюда файлы с хэшем в имени и их сжатые копии (.gz, .br)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'common.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Раздача статики и медиа самим приложением при DEBUG = False (common.serving):
+# без nginx перед gunicorn. Если nginx есть, выключите и отдавайте STATIC_ROOT им.
+SERVE_FILES = os.getenv('SERVE_FILES', 'True') == 'True'
+
+# Internal location nginx для медиа (например, /protected-media/): файл отдает nginx
+# по X-Accel-Redirect. Пусто - медиа отдает приложение (sendfile под gunicorn).
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+
+# Медиа не хэшируется (имя может быть переиспользовано) - кэш на сутки с перепроверкой по ETag
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 60 * 60 * 24))
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Процессов для генерации производных изображений при загрузке (common.images)
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv('IMAGE_DERIVATIVE_WORKERS', 2))
+
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
@@ -152,4 +309,30 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'users.User'
+# REST API (/api/): JWT для клиентов, сессия - для браузера и browsable API
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticated',
+    ),
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+}
+
+# OpenAPI-схема API: /api/schema/, документация - /api/docs/
+SPECTACULAR_SETTINGS = {
+    'TITLE': 'iOStrade API',
+    'DESCRIPTION': 'Каталог товаров и история заказов.',
+    'VERSION': '1.0.0',
+    'SERVE_INCLUDE_SCHEMA': False,
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+}
@@ -14,12 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
 from importlib.metadata import requires
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings  # <-- Импортируем settings
 from django.conf.urls.static import static  # <-- Импортируем static
+from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from common.metrics import metrics_view
+from common.serving import serve_media, serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,8 +39,25 @@ urlpatterns = [
     path('carts/', include('carts.urls', namespace='carts')),
 
     path('orders/', include('orders.urls', namespace='orders')),
+
+    # REST API: JWT-токены и ресурсы приложений
+    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/', include('orders.api_urls', namespace='orders_api')),
+    path('api/', include('products.api_urls', namespace='products_api')),
+    path('api/schema/', SpectacularAPIView.as_view(), name='api_schema'),
+    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api_schema'), name='api_docs'),
+
+    # Счетчики для Prometheus (попадания в кэш фрагментов и т. п.)
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 # --- Маршрут для раздачи медиафайлов в режиме разработки ---
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# --- Без DEBUG: статика из STATIC_ROOT (хэшированные имена, сжатые копии) и медиа ---
+elif settings.SERVE_FILES:
+    urlpatterns += [
+        re_path(r'^{}(?P<path>.*)$'.format(re.escape(settings.STATIC_URL.lstrip('/'))), serve_static),
+        re_path(r'^{}(?P<path>.*)$'.format(re.escape(settings.MEDIA_URL.lstrip('/'))), serve_media),
+    ]
\ No newline at end of file
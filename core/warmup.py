@@ -0,0 +1,105 @@
+"""
+Прогрев процесса перед приемом трафика: первый запрос нового воркера (после выкладки
+или перезапуска по max_requests) должен стоить столько же, сколько обычный.
+
+warm_process - то, что не открывает сокетов: можно выполнять в мастере gunicorn до fork
+(preload_app), воркеры получат результат готовым. warm_worker - проверка БД (с пулом -
+теплые соединения) и данные из кэша и БД: только в самом воркере (gunicorn.conf.py, post_fork).
+"""
+import time
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import connections
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+
+from common.templating import warm_templates
+
+
+def _named_urls(patterns, namespace=''):
+    for pattern in patterns:
+        # Регулярное выражение маршрута компилируется при первом обращении
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from _named_urls(pattern.url_patterns, prefix)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def warm_url_resolver():
+    """
+    Компилирует регулярные выражения всех маршрутов и строит словари reverse(): корневой
+    и резолверы пространств имен, которые reverse('ns:name') создает и кэширует при
+    первом обращении (get_ns_resolver). Возвращает число именованных маршрутов.
+    """
+    names = list(_named_urls(get_resolver().url_patterns))
+    for name in names:
+        try:
+            reverse(name)
+        except NoReverseMatch:
+            # Маршрут с параметрами - резолвер его пространства имен уже построен
+            pass
+    return len(names)
+
+
+def warm_storages():
+    """
+    Создает хранилища файлов из STORAGES: ManifestStaticFilesStorage при создании читает
+    манифест collectstatic (staticfiles.json), иначе это делает первый {% static %}.
+    """
+    for alias in settings.STORAGES:
+        storages[alias]
+    return len(settings.STORAGES)
+
+
+def warm_databases():
+    """
+    Проверяет подключение к каждой базе из DATABASES: ошибка всплывает при старте воркера,
+    а не на запросе пользователя. Теплые соединения остаются только с пулом psycopg
+    (DB_POOL_MAX_SIZE): соединение возвращается в пул, пул наполняется до min_size.
+    Без пула соединение закрывается: постоянное соединение (CONN_MAX_AGE) привязано к потоку,
+    а запросы обслуживают другие потоки (gthread, sync_to_async под ASGI), и первый запрос
+    каждого потока все равно открывает свое. Возвращает число баз с прогретым пулом.
+    """
+    pooled = 0
+    for connection in connections.all():
+        connection.ensure_connection()
+        pool = getattr(connection, 'pool', None)
+        connection.close()
+        if pool is not None:
+            pool.wait()
+            pooled += 1
+    return pooled
+
+
+def _timed(steps):
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def warm_process():
+    """
+    Шаблоны, маршруты и хранилища файлов. Возвращает {шаг: секунды}.
+    """
+    return _timed([('templates', warm_templates), ('urls', warm_url_resolver), ('storages', warm_storages)])
+
+
+def warm_worker():
+    """
+    Полный прогрев воркера: подключение к БД, реестр категорий (общий кэш или БД) и то,
+    что делает warm_process (после preload_app - уже готово и почти ничего не стоит).
+    """
+    # Модели импортируются только после django.setup(): core/wsgi.py импортирует модуль раньше
+    from products.registry import category_registry
+
+    timings = _timed([
+        ('databases', warm_databases),
+        ('categories', category_registry.all),
+    ])
+    timings.update(warm_process())
+    return timings
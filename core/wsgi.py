@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from core.warmup import warm_process
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 application = get_wsgi_application()
+
+# Шаблоны и маршруты компилируются при старте процесса (с gunicorn --preload - в мастере,
+# до fork), а не на первых запросах. Соединения с БД прогревает gunicorn.conf.py в воркерах
+if settings.TEMPLATE_WARMUP:
+    warm_process()
@@ -0,0 +1,74 @@
+"""
+Настройки gunicorn; читаются автоматически при запуске из корня проекта:
+
+    gunicorn                      # WSGI (core.wsgi), воркеры gthread
+    ASYNC_VIEWS=True gunicorn     # ASGI (core.asgi), воркеры uvicorn, асинхронные представления
+
+Значения переопределяются переменными окружения ниже (.env) или ключами командной строки.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+CORES = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+wsgi_app = 'core.asgi:application' if ASYNC_VIEWS else 'core.wsgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker' if ASYNC_VIEWS else 'gthread'
+
+# gthread: 2 x ядра + 1 процесс, пока одни ждут БД, другие заняты CPU; в каждом
+# GUNICORN_THREADS потоков. Постоянных соединений с БД - до workers x threads на базу,
+# это число должно помещаться в max_connections PostgreSQL вместе с другими серверами.
+# uvicorn: цикл событий не простаивает на ожидании - процесс на ядро.
+workers = int(os.getenv('WEB_CONCURRENCY', CORES if ASYNC_VIEWS else 2 * CORES + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Приложение загружается в мастере один раз: воркеры получают импортированный код,
+# скомпилированные шаблоны и маршруты при fork (core.warmup.warm_process) и делят
+# их страницы памяти. Новый код подхватывается только полным перезапуском мастера.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Воркер перезапускается после max_requests запросов (страховка от утечек памяти);
+# случайная добавка до max_requests_jitter, чтобы воркеры не перезапускались одновременно
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Keep-alive соединений от балансировщика (nginx), секунды
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+
+def pre_fork(server, worker):
+    # Сокеты БД и кэша, открытые в мастере при загрузке приложения, не должны достаться
+    # воркерам общими: каждый воркер открывает свои
+    if server.cfg.preload_app:
+        from django.core.cache import caches
+        from django.db import connections
+
+        connections.close_all()
+        caches.close_all()
+
+
+def post_fork(server, worker):
+    # Воркер еще не принимает соединений: прогреваем его, пока запросы обслуживают остальные
+    if server.cfg.preload_app:
+        _warm_worker(worker)
+
+
+def post_worker_init(worker):
+    # Без preload_app приложение загружается в воркере уже после post_fork
+    if not worker.cfg.preload_app:
+        _warm_worker(worker)
+
+
+def _warm_worker(worker):
+    from core.warmup import warm_worker
+
+    timings = warm_worker()
+    worker.log.info('Воркер %s прогрет: %s', worker.pid,
+                    ', '.join(f'{name} {seconds * 1000:.0f} мс' for name, seconds in timings.items()))
@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import PaymentEvent, PaymentOutbox
+
+
+@admin.register(PaymentOutbox)
+class PaymentOutboxAdmin(admin.ModelAdmin):
+    """
+    Очередь платежных сессий: видно зависшие и упавшие задачи.
+    """
+    list_display = ('order', 'status', 'attempts', 'next_attempt_at', 'updated_timestamp')
+    list_filter = ('status',)
+    readonly_fields = ('order', 'payload', 'idempotency_key', 'session_id', 'session_url', 'last_error')
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    """
+    Журнал событий Stripe: необработанные события - с пустой датой обработки,
+    оплаты отмененных заказов - с отметкой "Требует возврата".
+    """
+    list_display = ('event_id', 'type', 'order_id', 'received_timestamp', 'processed_timestamp', 'needs_refund')
+    list_filter = ('type', 'needs_refund')
+    search_fields = ('event_id', 'order_id')
+    readonly_fields = ('event_id', 'type', 'order_id', 'payload', 'processed_timestamp', 'needs_refund')
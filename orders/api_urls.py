@@ -0,0 +1,11 @@
+from rest_framework.routers import SimpleRouter
+
+from .api_views import OrderItemViewSet, OrderViewSet
+
+app_name = 'orders_api'
+
+router = SimpleRouter()
+router.register('orders', OrderViewSet, basename='order')
+router.register('order-items', OrderItemViewSet, basename='order_item')
+
+urlpatterns = router.urls
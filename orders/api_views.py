@@ -0,0 +1,112 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.decorators import action
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from common.api import KeysetCursorPagination, get_requested_fields, only_requested_fields
+from .models import Order, OrderItem
+from .serializers import OrderItemSerializer, OrderSerializer
+
+# Размер пачки серверного курсора при выгрузке: память не зависит от числа заказов
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_CSV_HEADER = ('order_id', 'created_timestamp', 'status', 'total_amount',
+                     'product_id', 'name', 'price', 'quantity')
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: write() возвращает строку, а не копит ее в памяти.
+    """
+    def write(self, value):
+        return value
+
+
+class OrderViewSet(ReadOnlyModelViewSet):
+    """
+    Заказы текущего пользователя (только чтение): курсорная пагинация от новых к старым,
+    ?fields= - только нужные поля, /export/csv/ и /export/ndjson/ - потоковая выгрузка всей истории.
+    """
+    serializer_class = OrderSerializer
+    pagination_class = KeysetCursorPagination
+    # Страница заказов с позициями - фиксированное число запросов (common.profiling.QueryBudgetMiddleware)
+    query_budget = 6
+
+    def get_queryset(self):
+        # Генератор схемы (drf-spectacular) вызывает представление без пользователя
+        if getattr(self, 'swagger_fake_view', False):
+            return Order.objects.none()
+        queryset = Order.objects.filter(user=self.request.user).order_by('-created_timestamp', '-id')
+        requested = get_requested_fields(self.request)
+        if requested is None or 'items' in requested:
+            queryset = queryset.prefetch_related('orderitem_set')
+        return only_requested_fields(queryset, OrderSerializer, requested, required=('id',))
+
+    @extend_schema(
+        parameters=[OpenApiParameter('export_format', str, OpenApiParameter.PATH, enum=['csv', 'ndjson'])],
+        responses={(200, 'text/csv'): OpenApiTypes.STR, (200, 'application/x-ndjson'): OpenApiTypes.STR},
+    )
+    @action(detail=False, url_path=r'export/(?P<export_format>csv|ndjson)', pagination_class=None)
+    def export(self, request, export_format):
+        """
+        Потоковая выгрузка истории заказов: серверный курсор (iterator(chunk_size)),
+        позиции подгружаются отдельным запросом на каждую пачку заказов.
+        """
+        queryset = (
+            Order.objects.filter(user=request.user)
+            .order_by('-created_timestamp', '-id')
+            .only('id', 'created_timestamp', 'status', 'total_amount', 'items_count')
+            .prefetch_related('orderitem_set')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        if export_format == 'csv':
+            rows, content_type = self._csv_rows(queryset), 'text/csv; charset=utf-8'
+        else:
+            rows, content_type = self._ndjson_rows(queryset), 'application/x-ndjson'
+
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
+    @staticmethod
+    def _csv_rows(orders):
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_CSV_HEADER)
+        for order in orders:
+            order_columns = (order.id, order.created_timestamp.isoformat(), order.status, order.total_amount)
+            for item in order.orderitem_set.all():
+                yield writer.writerow(order_columns + (item.product_id, item.name, item.price, item.quantity))
+
+    @staticmethod
+    def _ndjson_rows(orders):
+        for order in orders:
+            yield json.dumps({
+                'id': order.id,
+                'created_timestamp': order.created_timestamp,
+                'status': order.status,
+                'total_amount': order.total_amount,
+                'items_count': order.items_count,
+                'items': [{
+                    'product': item.product_id, 'name': item.name, 'price': item.price, 'quantity': item.quantity,
+                } for item in order.orderitem_set.all()],
+            }, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class OrderItemViewSet(ReadOnlyModelViewSet):
+    """
+    Позиции всех заказов текущего пользователя (только чтение), от новых к старым.
+    """
+    serializer_class = OrderItemSerializer
+    pagination_class = KeysetCursorPagination
+    query_budget = 5
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return OrderItem.objects.none()
+        queryset = OrderItem.objects.filter(order__user=self.request.user).order_by('-id')
+        return only_requested_fields(queryset, OrderItemSerializer, get_requested_fields(self.request), required=('id',))
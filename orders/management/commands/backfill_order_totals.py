@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Заполняет хранимые итоги заказов (total_amount, items_count) по позициям пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки (по id).')
+        parser.add_argument('--only-missing', action='store_true', help='Только заказы с items_count = 0.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Order.objects.order_by('id')
+        if options['only_missing']:
+            queryset = queryset.filter(items_count=0)
+
+        updated = 0
+        last_id = 0
+        while True:
+            # Пагинация по id (keyset) вместо OFFSET - каждая пачка стоит одинаково
+            ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += Order.objects.filter(id__in=ids).update_totals()
+            last_id = ids[-1]
+            self.stdout.write(f'Обновлено {updated} заказов...')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Итоги пересчитаны для {updated} заказов.'))
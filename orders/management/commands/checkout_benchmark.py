@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from carts.models import Cart
+from orders.models import Order
+from orders.services import place_order
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число SQL-запросов и время оформления заказа (orders.services.place_order) '
+        'для корзин разного размера. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20, 50], help='Размеры корзины.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:sizes[-1]])
+        if len(product_ids) < sizes[-1]:
+            raise CommandError(f'Нужно хотя бы {sizes[-1]} товаров, в базе {len(product_ids)}.')
+
+        query_counts = set()
+        for size in sizes:
+            with transaction.atomic():
+                user = User.objects.create(username='__checkout_benchmark__')
+                # Достаточный остаток, чтобы заказ прошел проверку наличия
+                Product.objects.filter(id__in=product_ids[:size]).update(quantity=1000)
+                Cart.objects.bulk_create([Cart(user=user, product_id=pid, quantity=2) for pid in product_ids[:size]])
+                cart_lines = list(Cart.objects.filter(user=user).with_totals())
+                order = Order.objects.create(user=user, first_name='-', last_name='-', email='bench@example.com',
+                                             phone_number='-', address='-')
+
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    place_order(order, cart_lines)
+                elapsed = (time.perf_counter() - started) * 1000
+
+                transaction.set_rollback(True)
+
+            query_counts.add(len(queries))
+            self.stdout.write(f'Корзина из {size:>3} товаров: {len(queries)} запросов, {elapsed:.1f} мс')
+
+        if len(query_counts) != 1:
+            raise CommandError('Число запросов растет вместе с размером корзины.')
+        self.stdout.write(self.style.SUCCESS('Число запросов не зависит от размера корзины.'))
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, PaymentOutbox
+from orders.payments import FakeGateway
+from orders.services import enqueue_payment_session, send_payment_sessions
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка воркера outbox на локальной замене Stripe (FakeGateway): временные ошибки '
+        'с повторами, идемпотентность повторной отправки и таймауты. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=40)
+        parser.add_argument('--failure-rate', type=float, default=0.3, help='Доля временных ошибок шлюза.')
+        parser.add_argument('--workers', type=int, default=8)
+
+    def handle(self, *args, **options):
+        product = Product.objects.with_sell_price().first()
+        if product is None:
+            raise CommandError('Нет товаров. Загрузите фикстуры: python manage.py loaddata products/fixtures/initial_data.json')
+
+        with transaction.atomic():
+            user = User.objects.create(username='__payment_outbox_check__')
+            orders = []
+            for _ in range(options['orders']):
+                order = Order.objects.create(user=user, first_name='-', last_name='-', email='check@example.com',
+                                             phone_number='-', address='-')
+                enqueue_payment_session(order, [(product, 1)])
+                orders.append(order)
+            outboxes = PaymentOutbox.objects.filter(order__in=orders)
+
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                # 1. Временные ошибки: все задачи должны дойти до READY за счет повторов
+                gateway = FakeGateway(latency=0.01, failure_rate=options['failure_rate'])
+                self._drain(gateway, executor, max_attempts=50)
+                not_ready = outboxes.exclude(status=PaymentOutbox.READY).count()
+                if not_ready:
+                    raise CommandError(f'{not_ready} задач не дошли до READY.')
+                self.stdout.write(f"Временные ошибки: {len(orders)} сессий за {gateway.calls} вызовов шлюза")
+
+                # 2. Идемпотентность: повторная отправка (например, после падения воркера) дает ту же сессию
+                sessions = dict(outboxes.values_list('id', 'session_id'))
+                outboxes.update(status=PaymentOutbox.PENDING, next_attempt_at=timezone.now())
+                self._drain(gateway, executor, max_attempts=50)
+                if dict(outboxes.values_list('id', 'session_id')) != sessions or len(gateway.sessions) != len(orders):
+                    raise CommandError('Повторная отправка создала новые сессии.')
+                self.stdout.write('Идемпотентность: повтор с тем же ключом вернул те же сессии')
+
+                # 3. Таймауты: шлюз не отвечает - после max_attempts задачи помечаются FAILED
+                outboxes.update(status=PaymentOutbox.PENDING, attempts=0, next_attempt_at=timezone.now())
+                self._drain(FakeGateway(timeout=0.05, latency=1), executor, max_attempts=2)
+                not_failed = outboxes.exclude(status=PaymentOutbox.FAILED).count()
+                if not_failed:
+                    raise CommandError(f'{not_failed} задач не помечены FAILED после таймаутов.')
+                self.stdout.write('Таймауты: задачи помечены FAILED после исчерпания попыток')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Outbox платежных сессий работает корректно.'))
+
+    def _drain(self, gateway, executor, max_attempts):
+        # Без пауз между повторами, пока в очереди есть готовые задачи
+        while any(send_payment_sessions(gateway, executor, lease=1, max_attempts=max_attempts, backoff=0).values()):
+            pass
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import apply_payment_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Обработчик журнала событий Stripe пачками: оплаченные заказы - в статус PAID, при отложенной '
+        'оплате резерв продлевается, при отказе или истечении сессии - снимается, заказ отменяется. '
+        'Оплаты отмененных заказов помечаются needs_refund (PaymentEvent) и пишутся в лог ошибок. '
+        'Можно запускать несколько экземпляров - события разбираются через SELECT ... SKIP LOCKED.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Событий за одну транзакцию.')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Пауза при пустом журнале, секунд.')
+        parser.add_argument('--once', action='store_true', help='Обработать накопившиеся события и выйти.')
+
+    def handle(self, *args, **options):
+        total_events = total_paid = 0
+        try:
+            while True:
+                events, paid = apply_payment_events(options['batch_size'])
+                total_events += events
+                total_paid += paid
+                if events:
+                    self.stdout.write(f'Событий: {events}, оплачено заказов: {paid}')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка обработчика.')
+
+        self.stdout.write(self.style.SUCCESS(f'Итого событий: {total_events}, оплачено заказов: {total_paid}'))
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.payments import GATEWAYS, get_gateway
+from orders.services import send_payment_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер outbox платежных сессий: создает Checkout Session для новых заказов '
+        'в пуле потоков, с таймаутами, повторами и ключами идемпотентности. '
+        'Можно запускать несколько экземпляров - задачи разбираются через SELECT ... SKIP LOCKED.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Потоков для запросов к шлюзу.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Задач за одну выборку.')
+        parser.add_argument('--timeout', type=float, default=10, help='Таймаут запроса к шлюзу, секунд.')
+        parser.add_argument('--lease', type=int, default=60,
+                            help='На сколько секунд задача скрывается от других воркеров после захвата.')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=float, default=2, help='Пауза перед первым повтором, секунд.')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Пауза при пустой очереди, секунд.')
+        parser.add_argument('--once', action='store_true', help='Разобрать готовые задачи и выйти.')
+        parser.add_argument('--gateway', choices=list(GATEWAYS), help='По умолчанию settings.PAYMENT_GATEWAY.')
+
+    def handle(self, *args, **options):
+        if options['lease'] <= options['timeout']:
+            raise CommandError('--lease должен быть больше --timeout, иначе задачу возьмут повторно до ответа шлюза.')
+
+        gateway = get_gateway(options['gateway'], timeout=options['timeout'])
+        totals = {'ready': 0, 'retry': 0, 'failed': 0}
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            try:
+                while True:
+                    stats = send_payment_sessions(
+                        gateway, executor, limit=options['batch_size'], lease=options['lease'],
+                        max_attempts=options['max_attempts'], backoff=options['backoff'],
+                    )
+                    for key, value in stats.items():
+                        totals[key] += value
+                    if any(stats.values()):
+                        self.stdout.write(
+                            f"Создано: {stats['ready']}, повтор: {stats['retry']}, ошибка: {stats['failed']}"
+                        )
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Остановка воркера.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Итого создано: {totals['ready']}, отложено: {totals['retry']}, с ошибкой: {totals['failed']}"
+        ))
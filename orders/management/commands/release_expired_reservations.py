@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import recount_reserved, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает истекшие резервы товаров неоплаченных заказов и отменяет эти заказы пачками. '
+        'Запускайте периодически (cron) с --once или постоянно в цикле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Заказов за одну транзакцию.')
+        parser.add_argument('--grace', type=int, default=300,
+                            help='Сколько секунд после истечения резерва ждать запоздавшей оплаты.')
+        parser.add_argument('--interval', type=float, default=60, help='Пауза между проходами, секунд.')
+        parser.add_argument('--once', action='store_true', help='Один проход и выход.')
+        parser.add_argument('--recount', action='store_true',
+                            help='Перед проходом пересчитать Product.reserved по активным резервам.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f'Исправлен резерв у товаров: {recount_reserved()}')
+
+        total = 0
+        try:
+            while True:
+                # Выбираем все истекшие пачками, затем ждем следующего прохода
+                while released := release_expired_reservations(options['batch_size'], options['grace']):
+                    total += released
+                    self.stdout.write(f'Отменено заказов: {released}')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка.')
+
+        self.stdout.write(self.style.SUCCESS(f'Итого отменено заказов с истекшим резервом: {total}'))
@@ -0,0 +1,104 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from orders.models import PaymentEvent
+
+# Заказы с такими ID не существуют: по умолчанию нагрузка не меняет реальные заказы
+SYNTHETIC_ORDER_ID = 10 ** 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон webhook: отправляет подписанные события Stripe (синтетические '
+        'или из журнала PaymentEvent) на запущенный сервер, включая повторные доставки. '
+        'Выводит задержки ответа и пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Адрес webhook. По умолчанию YOUR_DOMAIN + orders:stripe_webhook.')
+        parser.add_argument('--events', type=int, default=1000, help='Уникальных событий.')
+        parser.add_argument('--duplicates', type=float, default=0.3, help='Доля повторных доставок.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--order-ids', type=int, nargs='+',
+                            help='Реальные заказы для metadata.order_id (будут оплачены обработчиком).')
+        parser.add_argument('--from-journal', action='store_true',
+                            help='Повторить события из журнала PaymentEvent вместо синтетических.')
+
+    def handle(self, *args, **options):
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError('Не задан STRIPE_WEBHOOK_SECRET - сервер отклонит неподписанные события.')
+        url = options['url'] or '{}{}'.format(settings.YOUR_DOMAIN, reverse('orders:stripe_webhook'))
+
+        if options['from_journal']:
+            events = list(PaymentEvent.objects.order_by('id').values_list('payload', flat=True)[:options['events']])
+            if not events:
+                raise CommandError('Журнал PaymentEvent пуст.')
+        else:
+            events = self._synthetic_events(options['events'], options['order_ids'])
+        deliveries = events + random.choices(events, k=int(len(events) * options['duplicates']))
+        random.shuffle(deliveries)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(lambda event: self._deliver(url, secret, event), deliveries))
+        elapsed = time.perf_counter() - started
+
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        latencies = sorted(latency for _, latency in results)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(f'Доставок: {len(deliveries)} (уникальных {len(events)}) за {elapsed:.2f} с, '
+                          f'{len(deliveries) / elapsed:.0f} в секунду')
+        self.stdout.write(f'Ответы: {statuses}')
+        self.stdout.write(f'Задержка: p50 {percentile(0.5):.1f} мс, p95 {percentile(0.95):.1f} мс, '
+                          f'p99 {percentile(0.99):.1f} мс')
+        if set(statuses) != {200}:
+            raise CommandError('Часть событий отклонена.')
+        self.stdout.write(self.style.SUCCESS('Все события приняты. Обработайте их: python manage.py process_payment_events --once'))
+
+    def _synthetic_events(self, count, order_ids):
+        run = int(time.time())
+        return [{
+            'id': f'evt_replay_{run}_{i}',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': f'cs_replay_{run}_{i}',
+                'object': 'checkout.session',
+                'payment_status': 'paid',
+                'metadata': {'order_id': str(order_ids[i % len(order_ids)] if order_ids else SYNTHETIC_ORDER_ID + i)},
+            }},
+        } for i in range(count)]
+
+    def _deliver(self, url, secret, event):
+        # Подпись в формате заголовка Stripe-Signature: t=<время>,v1=HMAC-SHA256("<время>.<тело>")
+        body = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f'{timestamp}.{body}'.encode(), hashlib.sha256).hexdigest()
+        request = urllib.request.Request(url, data=body.encode(), method='POST', headers={
+            'Content-Type': 'application/json', 'Stripe-Signature': f't={timestamp},v1={signature}',
+        })
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except urllib.error.URLError:
+            status = 'connection error'
+        return status, time.perf_counter() - started
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0002_alter_orderitem_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Параметры сессии")),
+                (
+                    "idempotency_key",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Ключ идемпотентности"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Ожидает отправки"),
+                            ("READY", "Сессия создана"),
+                            ("FAILED", "Ошибка"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(default=0, verbose_name="Попыток"),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Следующая попытка",
+                    ),
+                ),
+                (
+                    "session_id",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="ID сессии"
+                    ),
+                ),
+                (
+                    "session_url",
+                    models.TextField(blank=True, verbose_name="URL оплаты"),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Последняя ошибка"),
+                ),
+                (
+                    "created_timestamp",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_timestamp",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+                ),
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_outbox",
+                        to="orders.order",
+                        verbose_name="Заказ",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Платежная сессия",
+                "verbose_name_plural": "Очередь платежных сессий",
+                "db_table": "order_payment_outbox",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "PENDING")),
+                        fields=["next_attempt_at"],
+                        name="payment_outbox_due_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_payment_outbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_id",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="ID события"
+                    ),
+                ),
+                ("type", models.CharField(max_length=100, verbose_name="Тип события")),
+                (
+                    "order_id",
+                    models.PositiveBigIntegerField(
+                        blank=True, null=True, verbose_name="ID заказа"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Данные события")),
+                (
+                    "received_timestamp",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата получения"
+                    ),
+                ),
+                (
+                    "processed_timestamp",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата обработки"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие оплаты",
+                "verbose_name_plural": "События оплаты",
+                "db_table": "order_payment_event",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_timestamp__isnull", True)),
+                        fields=["id"],
+                        name="payment_event_unprocessed_idx",
+                    )
+                ],
+            },
+        ),
+    ]
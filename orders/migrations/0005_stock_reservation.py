@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_payment_event"),
+        ("products", "0007_product_reserved"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("CREATED", "Создан"),
+                    ("PAID", "Оплачен"),
+                    ("ON_WAY", "В пути"),
+                    ("DELIVERED", "Доставлен"),
+                    ("CANCELED", "Отменен"),
+                ],
+                default="CREATED",
+                max_length=50,
+                verbose_name="Статус заказа",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("expires_at", models.DateTimeField(verbose_name="Действует до")),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="orders.order",
+                        verbose_name="Заказ",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="products.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Резерв товара",
+                "verbose_name_plural": "Резервы товаров",
+                "db_table": "order_stock_reservation",
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="stock_reservation_expires_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_stock_reservation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="items_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество товаров"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=12,
+                verbose_name="Сумма заказа",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_timestamp", "-id"],
+                name="order_user_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0006_order_totals"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status__in", ["CREATED", "PAID", "ON_WAY"])),
+                fields=["status", "created_timestamp"],
+                name="order_open_status_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0007_order_open_status_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentevent",
+            name="needs_refund",
+            field=models.BooleanField(default=False, verbose_name="Требует возврата"),
+        ),
+    ]
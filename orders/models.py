@@ -1,17 +1,36 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from users.models import User
 
+
+class OrderQueryset(models.QuerySet):
+    def update_totals(self):
+        # Пересчитывает хранимые total_amount и items_count по позициям одним UPDATE
+        items = OrderItem.objects.filter(order=OuterRef('pk')).values('order')
+        return self.update(
+            total_amount=Coalesce(
+                Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')), 0,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            items_count=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        )
+
+
 class Order(models.Model):
     # Статусы заказа
     CREATED = 'CREATED'
     PAID = 'PAID'
     ON_WAY = 'ON_WAY'
     DELIVERED = 'DELIVERED'
+    CANCELED = 'CANCELED'
     STATUSES = [
         (CREATED, 'Создан'),
         (PAID, 'Оплачен'),
         (ON_WAY, 'В пути'),
         (DELIVERED, 'Доставлен'),
+        (CANCELED, 'Отменен'),
     ]
 
     user = models.ForeignKey(to=User, on_delete=models.SET_DEFAULT, default=None, null=True, blank=True,
@@ -24,12 +43,27 @@ class Order(models.Model):
 
     created_timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания заказа')
     status = models.CharField(max_length=50, choices=STATUSES, default=CREATED, verbose_name='Статус заказа')
+    # Хранимые итоги заказа: заполняются при оформлении (place_order), при изменении позиций
+    # пересчитываются сигналами (orders.signals), для старых заказов - командой backfill_order_totals
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                       verbose_name='Сумма заказа')
+    items_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество товаров')
+
+    objects = OrderQueryset.as_manager()
 
     class Meta:
         db_table = 'order'
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ('-created_timestamp',)
+        indexes = [
+            # История заказов пользователя (keyset-пагинация в личном кабинете)
+            models.Index(fields=['user', '-created_timestamp', '-id'], name='order_user_created_idx'),
+            # Очереди обработки заказов по статусу (старые первыми). Завершенные заказы - большая
+            # часть таблицы - в индекс не входят
+            models.Index(fields=['status', 'created_timestamp'], name='order_open_status_idx',
+                         condition=models.Q(status__in=['CREATED', 'PAID', 'ON_WAY'])),
+        ]
 
     def __str__(self):
         return f"Заказ №{self.id} | {self.first_name} {self.last_name}"
@@ -49,4 +83,106 @@ class OrderItem(models.Model):
         verbose_name_plural = 'Проданные товары'
 
     def __str__(self):
-        return f"Товар '{self.name}' для заказа №{self.order.id}"
\ No newline at end of file
+        return f"Товар '{self.name}' для заказа №{self.order_id}"
+
+
+class StockReservation(models.Model):
+    """
+    Резерв товара неоплаченным заказом. Пока резерв активен, количество учтено в Product.reserved;
+    при оплате резерв списывается с остатка, по истечении expires_at - снимается
+    командой release_expired_reservations, а заказ отменяется.
+    """
+    order = models.ForeignKey(to=Order, on_delete=models.CASCADE, related_name='reservations', verbose_name='Заказ')
+    product = models.ForeignKey(to='products.Product', on_delete=models.CASCADE, verbose_name='Продукт')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    expires_at = models.DateTimeField(verbose_name='Действует до')
+
+    class Meta:
+        db_table = 'order_stock_reservation'
+        verbose_name = 'Резерв товара'
+        verbose_name_plural = 'Резервы товаров'
+        indexes = [
+            models.Index(fields=['expires_at'], name='stock_reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Резерв {self.quantity} шт. для заказа №{self.order_id}"
+
+
+class PaymentOutboxQueryset(models.QuerySet):
+    def due(self):
+        # Задачи, которые пора отправить: новые, отложенные после ошибки или брошенные упавшим воркером
+        return self.filter(status=PaymentOutbox.PENDING, next_attempt_at__lte=timezone.now())
+
+
+class PaymentOutbox(models.Model):
+    """
+    Transactional outbox платежных сессий: запись создается в той же транзакции, что и заказ,
+    а сессию в Stripe создает воркер (команда process_payment_outbox) вне цикла запроса.
+    """
+    PENDING = 'PENDING'
+    READY = 'READY'
+    FAILED = 'FAILED'
+    STATUSES = [
+        (PENDING, 'Ожидает отправки'),
+        (READY, 'Сессия создана'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    order = models.OneToOneField(to=Order, on_delete=models.CASCADE, related_name='payment_outbox',
+                                 verbose_name='Заказ')
+    payload = models.JSONField(verbose_name='Параметры сессии')
+    idempotency_key = models.CharField(max_length=64, unique=True, verbose_name='Ключ идемпотентности')
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    session_id = models.CharField(max_length=255, blank=True, verbose_name='ID сессии')
+    session_url = models.TextField(blank=True, verbose_name='URL оплаты')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_timestamp = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    objects = PaymentOutboxQueryset.as_manager()
+
+    class Meta:
+        db_table = 'order_payment_outbox'
+        verbose_name = 'Платежная сессия'
+        verbose_name_plural = 'Очередь платежных сессий'
+        indexes = [
+            # Частичный индекс: воркер выбирает только ожидающие задачи
+            models.Index(fields=['next_attempt_at'], name='payment_outbox_due_idx',
+                         condition=models.Q(status='PENDING')),
+        ]
+
+    def __str__(self):
+        return f"Платежная сессия заказа №{self.order_id} | {self.get_status_display()}"
+
+
+class PaymentEvent(models.Model):
+    """
+    Журнал событий Stripe (webhook). Уникальный event_id - дедупликация: повторная доставка
+    события отбрасывается одной вставкой с проверкой по индексу. Статусы заказов по событиям
+    меняет команда process_payment_events пачками.
+    """
+    event_id = models.CharField(max_length=255, unique=True, verbose_name='ID события')
+    type = models.CharField(max_length=100, verbose_name='Тип события')
+    # metadata.order_id сессии; без внешнего ключа - событие сохраняется и для неизвестного заказа
+    order_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='ID заказа')
+    payload = models.JSONField(verbose_name='Данные события')
+    received_timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Дата получения')
+    processed_timestamp = models.DateTimeField(null=True, blank=True, verbose_name='Дата обработки')
+    # Деньги получены, а заказ уже отменен или не найден (apply_payment_events): нужен возврат
+    needs_refund = models.BooleanField(default=False, verbose_name='Требует возврата')
+
+    class Meta:
+        db_table = 'order_payment_event'
+        verbose_name = 'Событие оплаты'
+        verbose_name_plural = 'События оплаты'
+        indexes = [
+            # Частичный индекс: обработчик выбирает только необработанные события
+            models.Index(fields=['id'], name='payment_event_unprocessed_idx',
+                         condition=models.Q(processed_timestamp__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.type} | {self.event_id}"
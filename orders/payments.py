@@ -0,0 +1,96 @@
+import hashlib
+import random
+import threading
+import time
+
+import stripe
+from django.conf import settings
+
+
+class PaymentGatewayError(Exception):
+    """
+    Ошибка платежного шлюза. retryable=True - временная ошибка (сеть, таймаут, 429, 5xx),
+    задачу стоит повторить с тем же ключом идемпотентности.
+    """
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class StripeGateway:
+    """
+    Создание Checkout Session в Stripe с таймаутом на HTTP-запрос и ключом идемпотентности.
+    Встроенные повторы клиента отключены: повторы делает воркер outbox с паузой между попытками.
+    """
+    def __init__(self, timeout=10):
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY or '',
+            http_client=stripe.new_default_http_client(timeout=timeout),
+            max_network_retries=0,
+        )
+
+    def create_checkout_session(self, payload, idempotency_key):
+        """
+        Возвращает (id сессии, URL оплаты).
+        """
+        try:
+            session = self.client.v1.checkout.sessions.create(
+                params=payload, options={'idempotency_key': idempotency_key},
+            )
+        except (stripe.APIConnectionError, stripe.RateLimitError, stripe.IdempotencyError) as e:
+            raise PaymentGatewayError(str(e)) from e
+        except stripe.StripeError as e:
+            # 4xx (кроме 429) - ошибка в параметрах или ключах, повтор не поможет
+            retryable = e.http_status is None or e.http_status >= 500
+            raise PaymentGatewayError(str(e), retryable=retryable) from e
+        return session.id, session.url
+
+
+class FakeGateway:
+    """
+    Локальная замена Stripe для разработки и проверки воркера (PAYMENT_GATEWAY=fake).
+    Ведет себя как Stripe в важных для outbox местах: задержка сети, временные ошибки
+    с заданной вероятностью и идемпотентность - повтор с тем же ключом возвращает ту же сессию.
+    "Оплата" сразу ведет на success_url.
+    """
+    def __init__(self, timeout=10, latency=0.05, failure_rate=0.0):
+        self.timeout = timeout
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sessions = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create_checkout_session(self, payload, idempotency_key):
+        with self._lock:
+            self.calls += 1
+        if self.latency > self.timeout:
+            time.sleep(self.timeout)
+            raise PaymentGatewayError('Превышено время ожидания ответа платежного шлюза.')
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise PaymentGatewayError('Временная ошибка платежного шлюза.')
+
+        with self._lock:
+            if idempotency_key not in self.sessions:
+                session_id = 'cs_test_' + hashlib.sha256(idempotency_key.encode()).hexdigest()[:24]
+                self.sessions[idempotency_key] = (session_id, payload['success_url'])
+            return self.sessions[idempotency_key]
+
+
+GATEWAYS = {
+    'stripe': StripeGateway,
+    'fake': FakeGateway,
+}
+
+
+def get_gateway(name=None, **options):
+    """
+    Шлюз по имени (по умолчанию settings.PAYMENT_GATEWAY).
+    """
+    name = name or settings.PAYMENT_GATEWAY
+    try:
+        gateway_class = GATEWAYS[name]
+    except KeyError:
+        raise ValueError(f'Неизвестный платежный шлюз "{name}". Доступны: {", ".join(GATEWAYS)}.')
+    return gateway_class(**options)
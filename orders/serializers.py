@@ -0,0 +1,28 @@
+from rest_framework import serializers
+
+from common.api import SparseFieldsetsMixin
+from .models import Order, OrderItem
+
+
+class OrderItemSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Позиция заказа: цена зафиксирована на момент оформления.
+    """
+    class Meta:
+        model = OrderItem
+        fields = ('id', 'order', 'product', 'name', 'price', 'quantity')
+
+
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Заказ пользователя с хранимыми итогами и позициями (items - только если запрошены).
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    items = OrderItemSerializer(source='orderitem_set', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            'id', 'status', 'status_display', 'created_timestamp', 'total_amount', 'items_count',
+            'first_name', 'last_name', 'email', 'phone_number', 'address', 'items',
+        )
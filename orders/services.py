@@ -0,0 +1,446 @@
+import json
+import logging
+from concurrent.futures import as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.forms import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Product
+from products.utils import bump_catalog_version, bump_product_versions
+from .models import Order, OrderItem, PaymentEvent, PaymentOutbox, StockReservation
+from .payments import PaymentGatewayError
+
+logger = logging.getLogger(__name__)
+
+# Резерв товаров заказа одним запросом; строка обновляется, только если доступного остатка хватает
+RESERVE_STOCK_SQL = """
+    UPDATE {table} AS product
+    SET reserved = product.reserved + ordered.quantity
+    FROM (VALUES {values}) AS ordered (id, quantity)
+    WHERE product.id = ordered.id AND product.quantity - product.reserved >= ordered.quantity
+"""
+
+# Закрытие резервов заказов: при оплате товар списывается с остатка, при истечении - возвращается
+# в доступный. Суммы по товарам считаются в подзапросе, все товары обновляются одним UPDATE.
+SETTLE_RESERVATIONS_SQL = """
+    UPDATE {product_table} AS product
+    SET {assignments}
+    FROM (
+        SELECT product_id, SUM(quantity) AS quantity FROM {reservation_table}
+        WHERE order_id = ANY(%s) GROUP BY product_id
+    ) AS reservation
+    WHERE product.id = reservation.product_id
+"""
+COMMIT_ASSIGNMENTS = """
+    quantity = GREATEST(product.quantity - reservation.quantity, 0),
+    reserved = GREATEST(product.reserved - reservation.quantity, 0),
+    sold_count = product.sold_count + reservation.quantity
+"""
+RELEASE_ASSIGNMENTS = """
+    reserved = GREATEST(product.reserved - reservation.quantity, 0)
+"""
+
+
+def place_order(order, cart_lines):
+    """
+    Переносит строки корзины в сохраненный заказ и резервирует товары до оплаты.
+    Вызывается внутри transaction.atomic(). Число запросов не зависит от размера корзины:
+    1. SELECT ... FOR UPDATE товаров в порядке id (одинаковый порядок блокировок - нет взаимных блокировок).
+    2. bulk_create позиций заказа по ценам из заблокированных строк.
+    3. UPDATE итогов заказа (total_amount, items_count).
+    4. bulk_create резервов со сроком STOCK_RESERVATION_TTL.
+    5. Один UPDATE: reserved = reserved + x WHERE quantity - reserved >= x.
+    Остаток (quantity) уменьшается только при оплате, см. apply_payment_events.
+    Возвращает список (товар, количество) для платежной сессии.
+    """
+    quantities = {}
+    for cart_item in cart_lines:
+        quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
+    if not quantities:
+        raise ValidationError('Ваша корзина пуста. Невозможно оформить заказ.')
+
+    products = list(
+        Product.objects.select_for_update()
+        .filter(id__in=quantities)
+        .only('id', 'name', 'price', 'discount', 'quantity', 'reserved')
+        .with_sell_price()
+        .order_by('id')
+    )
+    if len(products) != len(quantities):
+        raise ValidationError('Некоторые товары из корзины больше не продаются.')
+
+    for product in products:
+        if product.available_quantity < quantities[product.id]:
+            raise ValidationError(f'Недостаточно товара "{product.name}" на складе.')
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, name=product.name,
+                  price=product.sell_price, quantity=quantities[product.id])
+        for product in products
+    ])
+
+    # Итоги хранятся в заказе, чтобы история заказов не агрегировала позиции при каждом показе
+    order.total_amount = sum(product.sell_price * quantities[product.id] for product in products)
+    order.items_count = sum(quantities.values())
+    order.save(update_fields=['total_amount', 'items_count'])
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product=product, quantity=quantities[product.id], expires_at=expires_at)
+        for product in products
+    ])
+
+    updated = _reserve_stock(quantities)
+    # Строки заблокированы, поэтому расхождение возможно только при нарушении порядка блокировок
+    if updated != len(quantities):
+        raise ValidationError('Остатки товаров изменились. Попробуйте оформить заказ еще раз.')
+    # Доступный остаток изменился, а сигналы при UPDATE не срабатывают
+    bump_catalog_version()
+    bump_product_versions(quantities)
+
+    return [(product, quantities[product.id]) for product in products]
+
+
+def _reserve_stock(quantities):
+    """
+    Увеличивает резерв товаров по словарю {id товара: количество}.
+    Возвращает число обновленных товаров.
+    """
+    sql = RESERVE_STOCK_SQL.format(
+        table=connection.ops.quote_name(Product._meta.db_table),
+        values=', '.join(['(%s, %s)'] * len(quantities)),
+    )
+    params = [value for item in sorted(quantities.items()) for value in item]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _settle_reservations(order_ids, commit):
+    """
+    Закрывает все резервы заказов order_ids: commit=True - оплата (списание с остатка
+    и рост sold_count), commit=False - снятие резерва. Товары блокируются в порядке id,
+    как в place_order. Вызывается внутри транзакции, заказы уже заблокированы.
+    """
+    reservations = StockReservation.objects.filter(order_id__in=order_ids)
+    product_ids = list(
+        Product.objects.select_for_update()
+        .filter(id__in=reservations.values('product_id'))
+        .order_by('id').values_list('id', flat=True)
+    )
+    sql = SETTLE_RESERVATIONS_SQL.format(
+        product_table=connection.ops.quote_name(Product._meta.db_table),
+        reservation_table=connection.ops.quote_name(StockReservation._meta.db_table),
+        assignments=COMMIT_ASSIGNMENTS if commit else RELEASE_ASSIGNMENTS,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(order_ids)])
+    reservations.delete()
+    bump_catalog_version()
+    bump_product_versions(product_ids)
+
+
+def release_expired_reservations(limit=500, grace=300):
+    """
+    Снимает резервы неоплаченных заказов, истекшие больше grace секунд назад (запас на webhook,
+    который еще в пути), и отменяет эти заказы вместе с неотправленными платежными сессиями.
+    Заказ с созданной и еще не истекшей сессией оплаты не трогается: его закроет событие
+    Stripe (оплата или checkout.session.expired). Заказы берутся пачкой через SKIP LOCKED,
+    поэтому не конфликтуют с обработчиком оплат. Возвращает число отмененных заказов.
+    """
+    deadline = timezone.now() - timedelta(seconds=grace)
+    expired = StockReservation.objects.filter(expires_at__lte=deadline)
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status=Order.CREATED, id__in=expired.values('order_id'))
+            .exclude(payment_outbox__status=PaymentOutbox.READY,
+                     payment_outbox__payload__expires_at__gt=int(deadline.timestamp()))
+            .order_by('id').values_list('id', flat=True)[:limit]
+        )
+        if not order_ids:
+            return 0
+        _settle_reservations(order_ids, commit=False)
+        Order.objects.filter(id__in=order_ids).update(status=Order.CANCELED)
+        PaymentOutbox.objects.filter(order_id__in=order_ids, status=PaymentOutbox.PENDING).update(
+            status=PaymentOutbox.FAILED, last_error='Резерв товаров истек до создания сессии.',
+            updated_timestamp=timezone.now(),
+        )
+    return len(order_ids)
+
+
+def recount_reserved():
+    """
+    Пересчитывает денормализованный Product.reserved по активным резервам (восстановление
+    после ручных правок). Возвращает число исправленных товаров.
+    """
+    total = StockReservation.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        total=Sum('quantity'),
+    ).values('total')
+    actual = Coalesce(Subquery(total), 0)
+    product_ids = list(
+        Product.objects.annotate(actual_reserved=actual).exclude(reserved=F('actual_reserved'))
+        .values_list('id', flat=True)
+    )
+    if product_ids:
+        Product.objects.filter(id__in=product_ids).update(reserved=actual)
+        bump_catalog_version()
+        bump_product_versions(product_ids)
+    return len(product_ids)
+
+
+def enqueue_payment_session(order, ordered):
+    """
+    Записывает в outbox параметры платежной сессии заказа. Вызывается в той же транзакции,
+    что и place_order: заказ и задача на оплату сохраняются (или откатываются) вместе.
+    ordered - список (товар, количество) из place_order.
+    """
+    payload = {
+        'line_items': [{
+            'price_data': {
+                'currency': 'rub', 'unit_amount': int(product.sell_price * 100),
+                'product_data': {'name': product.name},
+            },
+            'quantity': quantity,
+        } for product, quantity in ordered],
+        'mode': 'payment',
+        'success_url': '{}{}'.format(settings.YOUR_DOMAIN, reverse('orders:order_success')),
+        'cancel_url': '{}{}'.format(settings.YOUR_DOMAIN, reverse('orders:order_cancel')),
+        'metadata': {'order_id': order.id},
+        # expires_at проставляется при первом захвате задачи воркером (claim_payment_sessions)
+    }
+    # Ключ не меняется между попытками: повтор после таймаута не создаст вторую сессию в Stripe
+    return PaymentOutbox.objects.create(
+        order=order, payload=payload, idempotency_key=f'checkout-session-order-{order.id}',
+    )
+
+
+# Stripe принимает expires_at от 30 минут до 24 часов после создания сессии. Срок отсчитывается
+# от первой попытки с запасом на повторы: параметры повторов с тем же ключом идемпотентности
+# не должны меняться, а повтор может уйти в Stripe через несколько минут после первой попытки
+SESSION_MIN_LIFETIME = 60 * 60
+SESSION_MAX_LIFETIME = 23 * 60 * 60
+
+
+def session_expires_at(outbox, now):
+    """
+    Срок платежной сессии: вместе с резервом товаров заказа, но не раньше SESSION_MIN_LIFETIME
+    от now (очередь или повторы задержали отправку, короткий STOCK_RESERVATION_TTL)
+    и не позже SESSION_MAX_LIFETIME.
+    """
+    reserved_until = outbox.created_timestamp + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    expires_at = min(max(reserved_until, now + timedelta(seconds=SESSION_MIN_LIFETIME)),
+                     now + timedelta(seconds=SESSION_MAX_LIFETIME))
+    return int(expires_at.timestamp())
+
+
+def claim_payment_sessions(limit, lease):
+    """
+    Забирает до limit задач outbox для отправки. Строки, занятые другим воркером,
+    пропускаются (SKIP LOCKED); взятые задачи откладываются на lease секунд - если воркер упадет,
+    задача вернется в очередь после истечения аренды и будет повторена с тем же ключом.
+    Попытка засчитывается уже при захвате. При первом захвате в параметры сессии записывается
+    expires_at (session_expires_at), повторы отправляют те же параметры.
+    """
+    with transaction.atomic():
+        claimed = list(
+            PaymentOutbox.objects.due()
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt_at')[:limit]
+        )
+        if claimed:
+            now = timezone.now()
+            PaymentOutbox.objects.filter(id__in=[outbox.id for outbox in claimed]).update(
+                next_attempt_at=now + timedelta(seconds=lease), attempts=F('attempts') + 1,
+            )
+            for outbox in claimed:
+                outbox.attempts += 1
+            first = [outbox for outbox in claimed if 'expires_at' not in outbox.payload]
+            for outbox in first:
+                outbox.payload['expires_at'] = session_expires_at(outbox, now)
+            PaymentOutbox.objects.bulk_update(first, ['payload'])
+    return claimed
+
+
+def complete_payment_session(outbox, session_id, session_url):
+    """
+    Сохраняет созданную сессию оплаты.
+    """
+    PaymentOutbox.objects.filter(id=outbox.id).update(
+        status=PaymentOutbox.READY, session_id=session_id, session_url=session_url,
+        last_error='', updated_timestamp=timezone.now(),
+    )
+
+
+def retry_payment_session(outbox, error, retryable, max_attempts, backoff):
+    """
+    Фиксирует неудачную попытку: откладывает задачу с экспоненциальной паузой
+    (backoff * 2^n, не больше 5 минут) или помечает ее FAILED, если повторять бессмысленно.
+    Возвращает True, если задача будет повторена.
+    """
+    will_retry = retryable and outbox.attempts < max_attempts
+    delay = min(backoff * 2 ** (outbox.attempts - 1), 300)
+    PaymentOutbox.objects.filter(id=outbox.id).update(
+        status=PaymentOutbox.PENDING if will_retry else PaymentOutbox.FAILED,
+        last_error=str(error),
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        updated_timestamp=timezone.now(),
+    )
+    return will_retry
+
+
+def send_payment_sessions(gateway, executor, limit=50, lease=60, max_attempts=5, backoff=2):
+    """
+    Одна итерация воркера outbox: забирает пачку задач и параллельно (пул потоков executor)
+    создает сессии в платежном шлюзе. В потоках только HTTP-запросы; результаты записываются
+    в БД из вызывающего потока. Возвращает словарь счетчиков ready / retry / failed.
+    """
+    stats = {'ready': 0, 'retry': 0, 'failed': 0}
+    claimed = claim_payment_sessions(limit, lease)
+    futures = {
+        executor.submit(gateway.create_checkout_session, outbox.payload, outbox.idempotency_key): outbox
+        for outbox in claimed
+    }
+    for future in as_completed(futures):
+        outbox = futures[future]
+        try:
+            session_id, session_url = future.result()
+        except PaymentGatewayError as e:
+            will_retry = retry_payment_session(outbox, e, e.retryable, max_attempts, backoff)
+        except Exception as e:
+            # Неожиданная ошибка (баг, сбой клиента) - считаем временной, попытки ограничены max_attempts
+            will_retry = retry_payment_session(outbox, repr(e), True, max_attempts, backoff)
+        else:
+            complete_payment_session(outbox, session_id, session_url)
+            stats['ready'] += 1
+            continue
+        stats['retry' if will_retry else 'failed'] += 1
+    return stats
+
+
+# События Checkout Session, которые сохраняются в журнал; остальные подтверждаются без записи
+PAYMENT_EVENT_TYPES = {
+    'checkout.session.completed',
+    'checkout.session.async_payment_succeeded',
+    'checkout.session.async_payment_failed',
+    'checkout.session.expired',
+}
+
+# Запись события webhook; повтор с тем же event_id отбрасывает уникальный индекс
+RECORD_EVENT_SQL = """
+    INSERT INTO {table} (event_id, type, order_id, payload, received_timestamp, needs_refund)
+    VALUES (%s, %s, %s, %s, %s, FALSE)
+    ON CONFLICT (event_id) DO NOTHING
+"""
+
+
+def record_payment_event(event):
+    """
+    Сохраняет событие webhook одним INSERT ... ON CONFLICT (event_id) DO NOTHING (в автокоммите,
+    без BEGIN/COMMIT): повторная доставка того же события стоит одной проверки по уникальному индексу.
+    Возвращает True, если событие новое.
+    """
+    if event['type'] not in PAYMENT_EVENT_TYPES:
+        return False
+    order_id = str(event['data']['object'].get('metadata', {}).get('order_id') or '')
+    sql = RECORD_EVENT_SQL.format(table=connection.ops.quote_name(PaymentEvent._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [event['id'], event['type'], int(order_id) if order_id.isdigit() else None,
+                             json.dumps(event), timezone.now()])
+        return cursor.rowcount == 1
+
+
+def _event_outcome(event):
+    """
+    Что событие значит для заказа: 'paid' - деньги получены, 'pending' - сессия завершена,
+    но оплата отложенная (банковский перевод и т.п.), 'failed' - оплаты не будет.
+    """
+    if event.type == 'checkout.session.async_payment_succeeded':
+        return 'paid'
+    if event.type == 'checkout.session.completed':
+        # completed приходит и для отложенных способов оплаты - тогда деньги еще не получены
+        return 'paid' if event.payload['data']['object'].get('payment_status') == 'paid' else 'pending'
+    return 'failed'
+
+
+def apply_payment_events(limit=500):
+    """
+    Обрабатывает пачку необработанных событий, каждый вид заказов - одним запросом:
+    - оплаченные заказы CREATED -> PAID, их резервы списываются с остатков;
+    - отложенная оплата: резерв продлевается на DELAYED_PAYMENT_RESERVATION_TTL, чтобы
+      release_expired_reservations не отменил заказ до async_payment_succeeded;
+    - оплата не прошла или сессия истекла: резерв снимается сразу, заказ отменяется.
+    Оплата заказа, который уже отменен (или неизвестен), не теряется: событие помечается
+    needs_refund и пишется в лог ошибок. Заказ в другом статусе не меняется, события
+    помечаются обработанными. Несколько обработчиков не мешают друг другу (SKIP LOCKED).
+    Возвращает (число событий, число оплаченных заказов).
+    """
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.filter(processed_timestamp__isnull=True)
+            .select_for_update(skip_locked=True)
+            .only('id', 'event_id', 'type', 'order_id', 'payload')
+            .order_by('id')[:limit]
+        )
+        if not events:
+            return 0, 0
+        outcomes = {'paid': set(), 'pending': set(), 'failed': set()}
+        for event in events:
+            if event.order_id:
+                outcomes[_event_outcome(event)].add(event.order_id)
+        # Оплата важнее остального: async_payment_succeeded после completed в той же пачке
+        outcomes['failed'] -= outcomes['paid']
+        outcomes['pending'] -= outcomes['paid'] | outcomes['failed']
+
+        open_ids = set(
+            Order.objects.select_for_update()
+            .filter(id__in=set().union(*outcomes.values()), status=Order.CREATED)
+            .order_by('id').values_list('id', flat=True)
+        )
+        paid = sorted(outcomes['paid'] & open_ids)
+        if paid:
+            Order.objects.filter(id__in=paid).update(status=Order.PAID)
+            _settle_reservations(paid, commit=True)
+        failed = sorted(outcomes['failed'] & open_ids)
+        if failed:
+            _settle_reservations(failed, commit=False)
+            Order.objects.filter(id__in=failed).update(status=Order.CANCELED)
+        pending = outcomes['pending'] & open_ids
+        if pending:
+            StockReservation.objects.filter(order_id__in=pending).update(
+                expires_at=timezone.now() + timedelta(seconds=settings.DELAYED_PAYMENT_RESERVATION_TTL),
+            )
+
+        _flag_refunds(
+            [event for event in events if _event_outcome(event) == 'paid' and event.order_id not in open_ids]
+        )
+        PaymentEvent.objects.filter(id__in=[event.id for event in events]).update(
+            processed_timestamp=timezone.now(),
+        )
+    return len(events), len(paid)
+
+
+def _flag_refunds(events):
+    """
+    Оплаты, которые некуда применить: заказ отменен (резерв истек раньше оплаты) или не найден.
+    Повторная оплата уже оплаченного заказа (то же событие другого типа) возврата не требует.
+    """
+    if not events:
+        return
+    settled = set(
+        Order.objects.filter(id__in={event.order_id for event in events})
+        .exclude(status__in=[Order.CREATED, Order.CANCELED]).values_list('id', flat=True)
+    )
+    lost = [event for event in events if event.order_id not in settled]
+    if not lost:
+        return
+    PaymentEvent.objects.filter(id__in=[event.id for event in lost]).update(needs_refund=True)
+    for event in lost:
+        logger.error('Оплата заказа №%s (%s) пришла после его отмены или для неизвестного заказа: нужен возврат',
+                     event.order_id, event.event_id)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals(sender, instance, raw=False, **kwargs):
+    """
+    Поддерживает Order.total_amount и items_count после изменения позиции заказа
+    (например, в админке). bulk_create при оформлении сигналы не вызывает - там итоги
+    заполняет place_order.
+    """
+    if raw:
+        return
+    Order.objects.filter(pk=instance.order_id).update_totals()
@@ -1,3 +1,282 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.forms import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from carts.models import Cart
+from orders.models import Order, PaymentEvent, PaymentOutbox, StockReservation
+from orders.payments import FakeGateway, PaymentGatewayError
+from orders.services import (
+    SESSION_MIN_LIFETIME, apply_payment_events, place_order, record_payment_event, release_expired_reservations,
+    send_payment_sessions,
+)
+from products.models import Category, Product
+from users.models import User
+
+
+class CheckoutTestCase(TestCase):
+    """
+    Товары с остатком 5 шт. и покупатель; make_order - заказ и строки корзины для place_order.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Телефоны', slug='phones')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Телефон {i}', slug=f'phone-{i}', category=category, price=100, quantity=5)
+            for i in range(5)
+        ])
+        cls.user = User.objects.create(username='buyer')
+
+    def make_order(self, quantities):
+        Cart.objects.filter(user=self.user).delete()
+        Cart.objects.bulk_create([
+            Cart(user=self.user, product=product, quantity=quantity) for product, quantity in quantities
+        ])
+        order = Order.objects.create(user=self.user, first_name='Иван', last_name='Иванов',
+                                     email='buyer@example.com', phone_number='+70000000000', address='Москва')
+        return order, list(Cart.objects.filter(user=self.user).with_totals())
+
+
+class PlaceOrderTests(CheckoutTestCase):
+    """
+    Оформление заказа (orders.services.place_order): фиксированное число запросов,
+    резерв при оформлении и списание остатка при оплате.
+    """
+    # SELECT ... FOR UPDATE, bulk_create позиций, UPDATE итогов, bulk_create резервов, UPDATE резерва
+    queries = 5
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for size in (1, len(self.products)):
+            with self.subTest(size=size):
+                order, cart_lines = self.make_order([(product, 1) for product in self.products[:size]])
+                with self.assertNumQueries(self.queries):
+                    place_order(order, cart_lines)
+
+    def test_stock_is_reserved_then_decremented_on_payment(self):
+        product = self.products[0]
+        order, cart_lines = self.make_order([(product, 2)])
+
+        place_order(order, cart_lines)
+
+        order.refresh_from_db()
+        self.assertEqual((order.items_count, order.total_amount), (2, 200))
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.reserved, product.available_quantity), (5, 2, 3))
+
+        record_payment_event({
+            'id': 'evt_paid', 'type': 'checkout.session.completed',
+            'data': {'object': {'payment_status': 'paid', 'metadata': {'order_id': str(order.id)}}},
+        })
+        self.assertEqual(apply_payment_events(), (1, 1))
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PAID)
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.reserved, product.sold_count), (3, 0, 2))
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+
+    def test_insufficient_stock_is_rejected(self):
+        product = self.products[0]
+        order, cart_lines = self.make_order([(product, 6)])
+
+        with self.assertRaises(ValidationError):
+            place_order(order, cart_lines)
+
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.reserved), (5, 0))
+
+
+class PaymentEventTests(CheckoutTestCase):
+    """
+    События Stripe (apply_payment_events) и уборка истекших резервов (release_expired_reservations):
+    отложенная оплата, отказ и оплата уже отмененного заказа.
+    """
+    def setUp(self):
+        self.product = self.products[0]
+        self.order, cart_lines = self.make_order([(self.product, 2)])
+        place_order(self.order, cart_lines)
+
+    def event(self, event_type, payment_status=None):
+        session = {'metadata': {'order_id': str(self.order.id)}}
+        if payment_status:
+            session['payment_status'] = payment_status
+        record_payment_event({'id': f'evt_{event_type}', 'type': event_type, 'data': {'object': session}})
+        return apply_payment_events()
+
+    def expire_reservations(self):
+        StockReservation.objects.filter(order=self.order).update(expires_at=timezone.now() - timedelta(hours=1))
+
+    def assert_stock(self, status, quantity, reserved):
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.order.status, self.product.quantity, self.product.reserved),
+                         (status, quantity, reserved))
+
+    def test_delayed_payment_keeps_reservation_until_paid(self):
+        self.event('checkout.session.completed', 'unpaid')
+
+        # Резерв продлен: уборка не отменяет заказ, пока деньги в пути
+        reservation = StockReservation.objects.get(order=self.order)
+        self.assertGreater(reservation.expires_at, timezone.now() + timedelta(days=1))
+        self.assertEqual(release_expired_reservations(), 0)
+
+        self.assertEqual(self.event('checkout.session.async_payment_succeeded'), (1, 1))
+        self.assert_stock(Order.PAID, 3, 0)
+
+    def test_failed_payment_releases_reservation(self):
+        self.assertEqual(self.event('checkout.session.async_payment_failed'), (1, 0))
+        self.assert_stock(Order.CANCELED, 5, 0)
+
+    def test_expired_session_releases_reservation(self):
+        self.assertEqual(self.event('checkout.session.expired'), (1, 0))
+        self.assert_stock(Order.CANCELED, 5, 0)
+
+    def test_sweeper_waits_for_open_payment_session(self):
+        self.expire_reservations()
+        PaymentOutbox.objects.create(
+            order=self.order, payload={'expires_at': int((timezone.now() + timedelta(minutes=30)).timestamp())},
+            idempotency_key=f'checkout-session-order-{self.order.id}', status=PaymentOutbox.READY,
+        )
+        self.assertEqual(release_expired_reservations(), 0)
+
+        PaymentOutbox.objects.filter(order=self.order).update(payload={'expires_at': 0})
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assert_stock(Order.CANCELED, 5, 0)
+
+    def test_payment_after_cancellation_is_flagged_for_refund(self):
+        self.expire_reservations()
+        self.assertEqual(release_expired_reservations(), 1)
+
+        with self.assertLogs('orders.services', 'ERROR'):
+            self.assertEqual(self.event('checkout.session.completed', 'paid'), (1, 0))
+
+        self.assert_stock(Order.CANCELED, 5, 0)
+        self.assertTrue(PaymentEvent.objects.get(event_id='evt_checkout.session.completed').needs_refund)
+
+
+class RejectingGateway:
+    """
+    Шлюз, который отвечает ошибкой с заданным retryable.
+    """
+    def __init__(self, retryable):
+        self.retryable = retryable
+
+    def create_checkout_session(self, payload, idempotency_key):
+        raise PaymentGatewayError('Ошибка платежного шлюза.', retryable=self.retryable)
+
+
+class PaymentOutboxTests(TestCase):
+    """
+    Воркер outbox платежных сессий (send_payment_sessions, команда process_payment_outbox).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        order = Order.objects.create(first_name='Иван', last_name='Иванов', email='buyer@example.com',
+                                     phone_number='+70000000000', address='Москва')
+        cls.outbox = PaymentOutbox.objects.create(
+            order=order, payload={'success_url': 'http://testserver/orders/success/'},
+            idempotency_key=f'checkout-session-order-{order.id}',
+        )
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def send(self, gateway, **options):
+        return send_payment_sessions(gateway, self.executor, **options)
+
+    def make_due(self):
+        # Пропускаем паузу перед повтором
+        PaymentOutbox.objects.filter(id=self.outbox.id).update(next_attempt_at=timezone.now())
+
+    def test_command_creates_session(self):
+        stdout = StringIO()
+        call_command('process_payment_outbox', '--once', '--gateway', 'fake', stdout=stdout)
+
+        self.outbox.refresh_from_db()
+        self.assertEqual(self.outbox.status, PaymentOutbox.READY)
+        self.assertEqual(self.outbox.attempts, 1)
+        self.assertTrue(self.outbox.session_id.startswith('cs_test_'))
+        self.assertEqual(self.outbox.session_url, 'http://testserver/orders/success/')
+        self.assertIn('Итого создано: 1', stdout.getvalue())
+
+    def test_retry_after_temporary_error_then_success(self):
+        gateway = FakeGateway(latency=0, failure_rate=1.0)
+        self.assertEqual(self.send(gateway, backoff=10), {'ready': 0, 'retry': 1, 'failed': 0})
+
+        self.outbox.refresh_from_db()
+        self.assertEqual((self.outbox.status, self.outbox.attempts), (PaymentOutbox.PENDING, 1))
+        self.assertEqual(self.outbox.last_error, 'Временная ошибка платежного шлюза.')
+        # Пауза перед повтором: задача не берется, пока не истечет backoff
+        self.assertGreater(self.outbox.next_attempt_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.send(gateway), {'ready': 0, 'retry': 0, 'failed': 0})
+
+        self.make_due()
+        gateway.failure_rate = 0.0
+        self.assertEqual(self.send(gateway), {'ready': 1, 'retry': 0, 'failed': 0})
+
+        self.outbox.refresh_from_db()
+        self.assertEqual((self.outbox.status, self.outbox.attempts), (PaymentOutbox.READY, 2))
+        self.assertEqual(self.outbox.last_error, '')
+
+    def test_repeated_delivery_reuses_session(self):
+        # Воркер упал после ответа шлюза: задача возвращается в очередь после аренды и отправляется снова
+        gateway = FakeGateway(latency=0)
+        self.send(gateway)
+        self.outbox.refresh_from_db()
+        first_session = self.outbox.session_id
+
+        PaymentOutbox.objects.filter(id=self.outbox.id).update(status=PaymentOutbox.PENDING)
+        self.make_due()
+        self.send(gateway)
+
+        self.outbox.refresh_from_db()
+        self.assertEqual(self.outbox.session_id, first_session)
+        self.assertEqual((gateway.calls, len(gateway.sessions)), (2, 1))
+
+    def test_backoff_grows_until_max_attempts(self):
+        gateway = RejectingGateway(retryable=True)
+        delays = []
+        for _ in range(2):
+            started = timezone.now()
+            self.send(gateway, max_attempts=3, backoff=10)
+            self.outbox.refresh_from_db()
+            delays.append((self.outbox.next_attempt_at - started).total_seconds())
+            self.make_due()
+        self.assertAlmostEqual(delays[0], 10, delta=2)
+        self.assertAlmostEqual(delays[1], 20, delta=2)
+
+        self.assertEqual(self.send(gateway, max_attempts=3, backoff=10), {'ready': 0, 'retry': 0, 'failed': 1})
+        self.outbox.refresh_from_db()
+        self.assertEqual((self.outbox.status, self.outbox.attempts), (PaymentOutbox.FAILED, 3))
+
+    def test_permanent_error_fails_without_retry(self):
+        self.assertEqual(self.send(RejectingGateway(retryable=False)), {'ready': 0, 'retry': 0, 'failed': 1})
+
+        self.outbox.refresh_from_db()
+        self.assertEqual((self.outbox.status, self.outbox.attempts), (PaymentOutbox.FAILED, 1))
+        self.make_due()
+        self.assertEqual(self.send(FakeGateway(latency=0)), {'ready': 0, 'retry': 0, 'failed': 0})
+
+    @override_settings(STOCK_RESERVATION_TTL=1800)
+    def test_session_expiry_is_fixed_at_first_send(self):
+        # Отправка задержалась на 20 минут: срок от оформления заказа Stripe бы уже не принял
+        PaymentOutbox.objects.filter(id=self.outbox.id).update(
+            created_timestamp=timezone.now() - timedelta(minutes=20),
+        )
+        started = timezone.now()
+        self.send(RejectingGateway(retryable=True), backoff=10)
+        self.outbox.refresh_from_db()
+        expires_at = self.outbox.payload['expires_at']
+        self.assertGreaterEqual(expires_at, int(started.timestamp()) + SESSION_MIN_LIFETIME)
+
+        # Повтор с тем же ключом идемпотентности отправляет те же параметры
+        self.make_due()
+        gateway = FakeGateway(latency=0)
+        self.assertEqual(self.send(gateway), {'ready': 1, 'retry': 0, 'failed': 0})
+        self.outbox.refresh_from_db()
+        self.assertEqual(self.outbox.payload['expires_at'], expires_at)
@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import OrderCreateView, OrderSuccessView, OrderCancelView
+from .views import OrderCreateView, OrderPaymentView, OrderSuccessView, OrderCancelView, stripe_webhook
 
 app_name = 'orders'
 
 urlpatterns = [
     path('create/', OrderCreateView.as_view(), name='create_order'),
+    path('payment/<int:order_id>/', OrderPaymentView.as_view(), name='order_payment'),
     path('order-success/', OrderSuccessView.as_view(), name='order_success'),
     path('order-cancel/', OrderCancelView.as_view(), name='order_cancel'),
+    path('webhook/stripe/', stripe_webhook, name='stripe_webhook'),
 ]
\ No newline at end of file
@@ -1,39 +1,45 @@
+import json
+
 import stripe
 from django.conf import settings
 from django.db import transaction
 from django.forms import ValidationError
-from django.shortcuts import redirect
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView, TemplateView
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib import messages
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+from common.profiling import query_budget
 from .forms import OrderCreateForm
-from .models import Order, OrderItem
+from .models import Order, PaymentOutbox
+from .services import enqueue_payment_session, place_order, record_payment_event
 from carts.models import Cart
 
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-
 @method_decorator(login_required(login_url=reverse_lazy('users:login')), name='dispatch')
 class OrderCreateView(CreateView):
     template_name = 'orders/create_order.html'
     form_class = OrderCreateForm
+    # Оформление: заказ, позиции, резервы, outbox и очистка корзины (см. place_order)
+    query_budget = 20
 
     def dispatch(self, request, *args, **kwargs):
         """
         Переопределяем dispatch, чтобы сначала проверить корзину.
         """
-        if not Cart.objects.filter(user=request.user).exists():
+        if not request.cart:
             messages.error(request, 'Ваша корзина пуста. Невозможно оформить заказ.')
             return redirect('products:index')
         return super().dispatch(request, *args, **kwargs)
 
     def form_valid(self, form):
         """
-        Создание заказа и сессии оплаты.
+        Создание заказа и задачи на создание сессии оплаты.
         """
         try:
             with transaction.atomic():
@@ -42,43 +48,22 @@ class OrderCreateView(CreateView):
                 order.user = self.request.user
                 order.save()
 
-                # Переносим товары из корзины в заказ
-                user_carts = Cart.objects.filter(user=self.request.user)
-                line_items = []
-                for cart_item in user_carts:
-                    # Проверка наличия на складе
-                    if cart_item.product.quantity < cart_item.quantity:
-                        raise ValidationError(f'Недостаточно товара "{cart_item.product.name}" на складе.')
-
-                    OrderItem.objects.create(
-                        order=order, product=cart_item.product, name=cart_item.product.name,
-                        price=cart_item.product.sell_price, quantity=cart_item.quantity
-                    )
-                    # Уменьшаем остатки
-                    cart_item.product.quantity -= cart_item.quantity
-                    cart_item.product.save()
-
-                    # Готовим список товаров для Stripe
-                    line_items.append({
-                        'price_data': {
-                            'currency': 'rub', 'unit_amount': int(cart_item.product.sell_price * 100),
-                            'product_data': {'name': cart_item.product.name},
-                        },
-                        'quantity': cart_item.quantity,
-                    })
+                # Переносим товары из корзины в заказ (корзина запроса уже загружена в dispatch):
+                # блокировка товаров, bulk_create позиций и списание остатков одним UPDATE
+                cart_lines = list(self.request.cart)
+                ordered = place_order(order, cart_lines)
+
+                # Задача на создание платежной сессии - в той же транзакции, что и заказ.
+                # Stripe вызывает воркер process_payment_outbox, а не поток, обслуживающий запрос
+                enqueue_payment_session(order, ordered)
 
                 # Очищаем корзину и сохраняем ID заказа в сессию
-                user_carts.delete()
+                Cart.objects.filter(user=self.request.user, id__in=[line.id for line in cart_lines]).delete()
+                self.request.cart.invalidate()
                 self.request.session['last_order_id'] = order.id
 
-            # Создаем сессию оплаты в Stripe
-            checkout_session = stripe.checkout.Session.create(
-                line_items=line_items, mode='payment',
-                success_url='{}{}'.format(settings.YOUR_DOMAIN, reverse('orders:order_success')),
-                cancel_url='{}{}'.format(settings.YOUR_DOMAIN, reverse('orders:order_cancel')),
-                metadata={'order_id': order.id}
-            )
-            return redirect(checkout_session.url, code=303)
+            # Страница ожидания перенаправит на оплату, как только воркер создаст сессию
+            return redirect('orders:order_payment', order_id=order.id)
 
         except ValidationError as e:
             messages.error(self.request, e.message)
@@ -103,13 +88,14 @@ class OrderCreateView(CreateView):
         """
         context = super().get_context_data(**kwargs)
         context['title'] = 'Оформление заказа'
-        context['carts'] = Cart.objects.filter(user=self.request.user)
+        context['carts'] = self.request.cart
         return context
 
 
 @method_decorator(login_required(login_url=reverse_lazy('users:login')), name='dispatch')
 class OrderSuccessView(TemplateView):
     template_name = 'orders/order_success.html'
+    query_budget = 5
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -123,5 +109,67 @@ class OrderSuccessView(TemplateView):
         return context
 
 
+@method_decorator(login_required(login_url=reverse_lazy('users:login')), name='dispatch')
+class OrderPaymentView(TemplateView):
+    """
+    Ожидание платежной сессии: как только воркер outbox создал ее, перенаправляет на оплату.
+    AJAX-запросы страницы получают статус в JSON (опрос раз в секунду).
+    """
+    template_name = 'orders/order_payment.html'
+    # Страница опрашивается раз в секунду
+    query_budget = 5
+
+    def get(self, request, *args, **kwargs):
+        self.outbox = get_object_or_404(
+            PaymentOutbox.objects.only('order_id', 'status', 'session_url'),
+            order_id=kwargs['order_id'], order__user=request.user,
+        )
+        if self.outbox.status == PaymentOutbox.FAILED:
+            messages.error(request, 'Не удалось создать платеж. Попробуйте позже или свяжитесь с нами.')
+
+        redirect_url = self._redirect_url()
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'status': self.outbox.status, 'redirect_url': redirect_url})
+        if redirect_url:
+            return redirect(redirect_url)
+        return super().get(request, *args, **kwargs)
+
+    def _redirect_url(self):
+        if self.outbox.status == PaymentOutbox.READY:
+            return self.outbox.session_url
+        if self.outbox.status == PaymentOutbox.FAILED:
+            return reverse('orders:order_cancel')
+        return None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Переход к оплате'
+        context['order_id'] = self.outbox.order_id
+        return context
+
+
 class OrderCancelView(TemplateView):
-    template_name = 'orders/order_cancel.html'
\ No newline at end of file
+    template_name = 'orders/order_cancel.html'
+    query_budget = 5
+
+@query_budget(2)
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Прием событий Stripe: проверка подписи и запись в журнал PaymentEvent, без обработки.
+    Статусы заказов меняет команда process_payment_events, поэтому ответ уходит за миллисекунды
+    и Stripe не повторяет доставку из-за таймаута.
+    """
+    payload = request.body
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'), request.headers.get('stripe-signature'), settings.STRIPE_WEBHOOK_SECRET,
+            tolerance=stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+        event = json.loads(payload)
+    except (stripe.SignatureVerificationError, UnicodeDecodeError, ValueError):
+        return HttpResponseBadRequest()
+
+    record_payment_event(event)
+    return HttpResponse(status=200)
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from common.profiling import query_shape
+from common.testing import capture_view_queries
+from pages.sample_data import sample_data
+
+# Размер таблиц по статистике планировщика (-1 - таблица еще ни разу не анализировалась)
+TABLE_ROWS_SQL = """
+    SELECT c.relname, c.reltuples FROM pg_class c
+    WHERE c.relkind IN ('r', 'p') AND c.relnamespace::regnamespace::text = ANY(current_schemas(false))
+"""
+
+
+def iter_plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_plan_nodes(child)
+
+
+class Command(BaseCommand):
+    help = (
+        'Аудит индексов: EXPLAIN для каждого SELECT, который выполняют представления core/urls.py '
+        '(аноним и пользователь с корзиной и заказом). Ошибка - Seq Scan по таблице от --min-rows строк. '
+        'На маленькой локальной базе планировщик читает таблицы целиком и при наличии индекса, поэтому '
+        'там запускайте с --no-seqscan: Seq Scan, оставшийся при enable_seqscan = off, значит, что '
+        'подходящего индекса нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Seq Scan по таблицам меньше этого размера (по статистике) допустим.')
+        parser.add_argument('--ignore-table', action='append', default=[],
+                            help='Таблица, полный просмотр которой ожидаем (можно указать несколько раз).')
+        parser.add_argument('--no-seqscan', action='store_true',
+                            help='Планировать с enable_seqscan = off (проверка индексов на маленькой базе).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Аудит планов работает только с PostgreSQL.')
+        min_rows, ignored = options['min_rows'], set(options['ignore_table'])
+
+        with sample_data() as (user, sample_kwargs):
+            authenticated = Client()
+            authenticated.force_login(user)
+            captured = capture_view_queries(Client(), sample_kwargs) + capture_view_queries(authenticated, sample_kwargs)
+
+            plans = {}
+            findings = []
+            with connection.cursor() as cursor:
+                cursor.execute(TABLE_ROWS_SQL)
+                table_rows = dict(cursor.fetchall())
+                if options['no_seqscan']:
+                    # Только до конца транзакции sample_data (она откатывается)
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                for name, path, status, queries in captured:
+                    scans = []
+                    for sql in queries:
+                        if not sql.lstrip().upper().startswith('SELECT'):
+                            continue
+                        shape = query_shape(sql)
+                        if shape not in plans:
+                            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                            plans[shape] = [
+                                node['Relation Name'] for node in iter_plan_nodes(cursor.fetchone()[0][0]['Plan'])
+                                if node['Node Type'] in ('Seq Scan', 'Parallel Seq Scan')
+                            ]
+                        scans.extend((table, sql) for table in plans[shape] if table not in ignored)
+                    for table, sql in scans:
+                        rows = table_rows.get(table, 0)
+                        if rows < 0:
+                            self.stderr.write(f'{table}: нет статистики, выполните ANALYZE')
+                        flagged = rows >= min_rows
+                        self.stdout.write(f'  {"!" if flagged else " "} {path} ({name}): Seq Scan {table}, ~{rows:.0f} строк')
+                        if flagged:
+                            findings.append(f'{name}: Seq Scan {table} (~{rows:.0f} строк): {sql[:300]}')
+            self.stdout.write(f'Представлений: {len(captured)}, разных SELECT: {len(plans)}')
+
+        for finding in findings:
+            self.stderr.write(finding)
+        if findings:
+            raise CommandError(f'Полных просмотров больших таблиц: {len(findings)}')
+        self.stdout.write(self.style.SUCCESS(f'Полных просмотров таблиц от {min_rows} строк нет.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from common.testing import check_query_budgets
+from pages.sample_data import sample_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка бюджетов SQL-запросов: GET на каждый маршрут core/urls.py от анонима '
+        'и от пользователя с корзиной и заказом (common.testing.assert_query_budgets). '
+        'Ошибка - превышение query_budget, N+1 или представление без бюджета. Данные откатываются.'
+    )
+
+    def handle(self, *args, **options):
+        failures = []
+        with sample_data() as (user, sample_kwargs):
+            authenticated = Client()
+            authenticated.force_login(user)
+            for title, client in (('Аноним', Client()), ('Пользователь', authenticated)):
+                self.stdout.write(f'{title}:')
+                report, errors = check_query_budgets(client, sample_kwargs)
+                failures.extend(errors)
+                for name, path, status, queries, budget in report:
+                    limit = budget if budget is not None else '-'
+                    self.stdout.write(f'  {queries:>3} / {limit:<3} {status} {path} ({name})')
+
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures:
+            raise CommandError(f'Нарушений: {len(failures)}')
+        self.stdout.write(self.style.SUCCESS('Все представления укладываются в бюджеты запросов.'))
@@ -0,0 +1,68 @@
+import gzip
+import posixpath
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from common import storage
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет результат collectstatic: каждое имя из манифеста указывает на существующий файл, '
+        'хэш в имени совпадает с содержимым, сжатые копии .gz/.br распаковываются в тот же файл. '
+        'С --media дополнительно проверяет, что файлы изображений товаров и аватаров существуют.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--media', action='store_true', help='Проверить ссылки на медиафайлы в БД.')
+
+    def handle(self, *args, **options):
+        problems = []
+        hashed_files = staticfiles_storage.hashed_files
+        if not hashed_files:
+            raise CommandError('Манифест staticfiles.json не найден или пуст. Выполните: python manage.py collectstatic')
+
+        compressed = 0
+        for name, hashed_name in sorted(hashed_files.items()):
+            if not staticfiles_storage.exists(hashed_name):
+                problems.append(f'{name}: нет файла {hashed_name}')
+                continue
+            with staticfiles_storage.open(hashed_name) as file:
+                content = file.read()
+                file_hash = staticfiles_storage.file_hash(hashed_name, file)
+            if file_hash and f'.{file_hash}' not in posixpath.basename(hashed_name):
+                problems.append(f'{hashed_name}: хэш содержимого {file_hash} не совпадает с именем')
+            for encoding, suffix in storage.ENCODINGS:
+                if not staticfiles_storage.exists(hashed_name + suffix):
+                    continue
+                if encoding == 'br' and storage.brotli is None:
+                    self.stderr.write(f'{hashed_name}{suffix}: brotli не установлен, копия не проверена')
+                    continue
+                with staticfiles_storage.open(hashed_name + suffix) as file:
+                    data = file.read()
+                try:
+                    data = storage.brotli.decompress(data) if encoding == 'br' else gzip.decompress(data)
+                except Exception as e:
+                    problems.append(f'{hashed_name}{suffix}: не распаковывается ({e})')
+                    continue
+                if data != content:
+                    problems.append(f'{hashed_name}{suffix}: содержимое отличается от {hashed_name}')
+                compressed += 1
+        self.stdout.write(f'Статика: {len(hashed_files)} файлов в манифесте, сжатых копий {compressed}')
+
+        if options['media']:
+            names = set(Product.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+            names |= set(User.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+            missing = sorted(name for name in names if not default_storage.exists(name))
+            problems.extend(f'медиа {name}: файл не найден' for name in missing)
+            self.stdout.write(f'Медиа: {len(names)} ссылок, отсутствует {len(missing)}')
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f'Найдено проблем: {len(problems)}')
+        self.stdout.write(self.style.SUCCESS('Целостность статики подтверждена.'))
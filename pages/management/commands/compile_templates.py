@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.templating import warm_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует все шаблоны проекта, как прогрев при старте воркера (TEMPLATE_WARMUP). '
+        'Выводит время и синтаксические ошибки - годится как проверка перед выкладкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Включая шаблоны админки и библиотек.')
+
+    def handle(self, *args, **options):
+        count, errors, elapsed = warm_templates(project_only=not options['all'])
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(f'Шаблонов: {count} за {elapsed * 1000:.0f} мс, ошибок: {len(errors)}')
+        if errors:
+            raise CommandError('Есть шаблоны с ошибками.')
+        self.stdout.write(self.style.SUCCESS('Все шаблоны скомпилированы.'))
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from products.models import Product
+
+SERVERS = {
+    # Синхронные представления, пул потоков в каждом воркере
+    'gunicorn': lambda port, options: [
+        sys.executable, '-m', 'gunicorn', 'core.wsgi:application', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(options['workers']), '--worker-class', 'gthread', '--threads', str(options['threads']),
+        '--log-level', 'warning',
+    ],
+    # Асинхронные представления каталога и корзины (ASYNC_VIEWS=True)
+    'uvicorn': lambda port, options: [
+        sys.executable, '-m', 'uvicorn', 'core.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(options['workers']), '--no-access-log', '--log-level', 'warning',
+    ],
+}
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+async def read_response(reader):
+    """
+    Читает ответ HTTP/1.1 с Content-Length (соединение остается открытым). Возвращает код ответа.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.lower().split(': ', 1) for line in lines[1:] if ': ' in line)
+    if 'content-length' not in headers:
+        raise CommandError(f'Ответ без Content-Length: {lines[0]}')
+    await reader.readexactly(int(headers['content-length']))
+    return int(lines[0].split()[1])
+
+
+async def load(port, paths, concurrency, duration, warmup):
+    """
+    concurrency клиентов с keep-alive, каждый по кругу запрашивает paths.
+    Запросы первых warmup секунд не учитываются. Возвращает (задержки в секундах, ошибки, время замера).
+    """
+    latencies, errors = [], []
+    started = time.perf_counter()
+    measure_from, stop_at = started + warmup, started + warmup + duration
+
+    async def client(number):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            i = number
+            while time.perf_counter() < stop_at:
+                path = paths[i % len(paths)]
+                i += 1
+                sent = time.perf_counter()
+                # Referer - для представлений корзины, которые возвращают на исходную страницу
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nReferer: /\r\n\r\n'.encode())
+                status = await read_response(reader)
+                if sent < measure_from:
+                    continue
+                latencies.append(time.perf_counter() - sent)
+                if status >= 400:
+                    errors.append(f'{status} {path}')
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(repr(e))
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    return sorted(latencies), errors, duration
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение серверов под нагрузкой: gunicorn (WSGI, gthread, синхронные представления) и uvicorn '
+        '(ASGI, асинхронные представления каталога и корзины, ASYNC_VIEWS=True) с теми же настройками. '
+        'Клиенты с keep-alive одновременно запрашивают страницы каталога; результат - RPS, p50 и p99. '
+        'Нагрузку создает этот же процесс (один цикл событий): при упоре клиента в ядро CPU '
+        'запускайте серверы на другой машине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=list(SERVERS), action='append', help='По умолчанию - оба.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных соединений.')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность замера, секунды.')
+        parser.add_argument('--warmup', type=float, default=2, help='Прогрев перед замером, секунды.')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=8, help='Потоков на воркер gunicorn.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', action='append', help='Адрес страницы (можно несколько раз). '
+                                                            'По умолчанию - каталог, категория и товар.')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or self.default_paths()
+        self.stdout.write(
+            f'Соединений: {options["concurrency"]}, воркеров: {options["workers"]}, замер {options["duration"]:.0f} с; '
+            f'страницы: {", ".join(paths)}'
+        )
+        servers = options['server'] or list(SERVERS)
+        if 'uvicorn' in servers and not settings.DB_POOL_MAX_SIZE:
+            # Под ASGI каждый запрос в работе держит свое соединение с БД
+            self.stderr.write('Без пула (DB_POOL_MAX_SIZE) uvicorn при большом числе соединений '
+                              'упрется в max_connections PostgreSQL.')
+        results = []
+        for name in servers:
+            results.append((name, self.run_server(name, paths, options)))
+
+        self.stdout.write(f'{"сервер":<10} {"запросов":>9} {"ошибок":>7} {"RPS":>8} {"p50, мс":>8} {"p99, мс":>8}')
+        failed = False
+        for name, (latencies, errors, duration) in results:
+            self.stdout.write(
+                f'{name:<10} {len(latencies):>9} {len(errors):>7} {len(latencies) / duration:>8.0f} '
+                f'{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}'
+            )
+            for error in sorted(set(errors))[:5]:
+                self.stderr.write(f'  {name}: {error}')
+            failed = failed or bool(errors)
+        if failed:
+            raise CommandError('Были ошибки: результаты неполные.')
+
+    @staticmethod
+    def default_paths():
+        product = Product.objects.select_related('category').first()
+        if product is None:
+            raise CommandError('Нет товаров. Загрузите фикстуры: python manage.py loaddata products/fixtures/initial_data.json')
+        return [
+            reverse('products:index'),
+            reverse('products:category', kwargs={'category_slug': product.category.slug}),
+            reverse('products:product', kwargs={'product_slug': product.slug}),
+        ]
+
+    def run_server(self, name, paths, options):
+        port = options['port']
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, ASYNC_VIEWS=str(name == 'uvicorn'))
+        process = subprocess.Popen(SERVERS[name](port, options), env=env, cwd=settings.BASE_DIR)
+        try:
+            self.wait_ready(process, port)
+            self.stdout.write(f'{name}: нагрузка...')
+            return asyncio.run(load(port, paths, options['concurrency'], options['duration'], options['warmup']))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    @staticmethod
+    def wait_ready(process, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Сервер завершился с кодом {process.returncode}')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1) as sock:
+                    sock.sendall(b'GET / HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n')
+                    if sock.recv(5) == b'HTTP/':
+                        return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'Сервер не ответил за {timeout} с')
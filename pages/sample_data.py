@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from carts.models import Cart
+from orders.models import Order, OrderItem, PaymentOutbox
+from products.models import Product
+from users.models import User
+
+
+@contextmanager
+def sample_data():
+    """
+    Данные для обхода всех маршрутов (check_query_budgets, audit_query_plans): пользователь
+    с корзиной и заказом. Возвращает (пользователь, sample_kwargs), где sample_kwargs(имя маршрута,
+    имя параметра) - значение параметра URL. Все изменения откатываются при выходе.
+    """
+    product = Product.objects.select_related('category').first()
+    if product is None:
+        raise CommandError(
+            'Нет товаров. Загрузите фикстуры: python manage.py loaddata products/fixtures/initial_data.json'
+        )
+
+    with transaction.atomic():
+        user = User.objects.create(username='__query_budget_check__')
+        Cart.objects.bulk_create([Cart(user=user, product=item, quantity=1) for item in Product.objects.all()[:5]])
+        order = Order.objects.create(user=user, first_name='-', last_name='-', email='check@example.com',
+                                     phone_number='-', address='-')
+        item = OrderItem.objects.create(order=order, product=product, name=product.name, price=product.price,
+                                        quantity=1)
+        PaymentOutbox.objects.create(order=order, payload={}, idempotency_key=f'query-budget-check-{order.id}')
+        Order.objects.filter(id=order.id).update_totals()
+
+        samples = {
+            'product_slug': product.slug,
+            'category_slug': product.category.slug,
+            'order_id': order.id,
+            'cart_id': Cart.objects.filter(user=user).values_list('id', flat=True).first(),
+            'export_format': 'csv',
+        }
+
+        def sample_kwargs(name, key):
+            if key == 'slug':
+                return product.category.slug if name.endswith('category-detail') else product.slug
+            if key == 'pk':
+                return item.id if 'order_item' in name else order.id
+            return samples[key]
+
+        try:
+            yield user, sample_kwargs
+        finally:
+            transaction.set_rollback(True)
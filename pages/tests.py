@@ -1,3 +1,23 @@
-from django.test import TestCase
+from django.test import Client, TestCase
 
-# Create your tests here.
+from common.testing import assert_query_budgets
+from pages.sample_data import sample_data
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Каждый маршрут core/urls.py укладывается в свой query_budget, без N+1 (common.testing),
+    для анонима и для пользователя с корзиной и заказом.
+    """
+    fixtures = ['initial_data.json']
+
+    def test_anonymous(self):
+        with sample_data() as (user, sample_kwargs):
+            assert_query_budgets(Client(), sample_kwargs)
+
+    def test_authenticated(self):
+        with sample_data() as (user, sample_kwargs):
+            client = Client()
+            client.force_login(user)
+            report = assert_query_budgets(client, sample_kwargs)
+        self.assertTrue(report)
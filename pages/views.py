@@ -1,6 +1,8 @@
 from django.views.generic import TemplateView
 
 class IndexView(TemplateView):
+    # Допустимое число SQL-запросов (common.profiling.QueryBudgetMiddleware)
+    query_budget = 5
     template_name = 'pages/index.html'
 
     def get_context_data(self, **kwargs):
@@ -11,6 +13,7 @@ class IndexView(TemplateView):
 
 
 class AboutView(TemplateView):
+    query_budget = 5
     template_name = 'pages/about.html'
 
     def get_context_data(self, **kwargs):
@@ -20,6 +23,7 @@ class AboutView(TemplateView):
 
 
 class DeliveryAndPaymentView(TemplateView):
+    query_budget = 5
     template_name = 'pages/delivery_and_payment.html'
 
     def get_context_data(self, **kwargs):
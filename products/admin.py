@@ -21,7 +21,7 @@ class ProductAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
     # list_display: Какие поля отображать в списке всех продуктов.
-    list_display = ('name', 'category', 'price', 'quantity', 'discount')
+    list_display = ('name', 'category', 'price', 'quantity', 'reserved', 'discount')
 
     # list_editable: Какие поля можно редактировать прямо из списка,
     list_editable = ('price', 'quantity','discount')
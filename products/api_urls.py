@@ -0,0 +1,11 @@
+from rest_framework.routers import SimpleRouter
+
+from .api_views import CategoryViewSet, ProductViewSet
+
+app_name = 'products_api'
+
+router = SimpleRouter()
+router.register('products', ProductViewSet, basename='product')
+router.register('categories', CategoryViewSet, basename='category')
+
+urlpatterns = router.urls
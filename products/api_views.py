@@ -0,0 +1,100 @@
+import hashlib
+
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework.permissions import AllowAny
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from common.api import KeysetCursorPagination, get_requested_fields, only_requested_fields
+from common.cache import is_shared_cache
+from .models import Category, Product
+from .registry import category_registry
+from .serializers import CategorySerializer, ProductSerializer
+from .sorting import SORT_OPTIONS
+from .utils import catalog_version, filter_catalog
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Сильный ETag ответа каталога: версия каталога + полный URL (фильтры, курсор, fields)
+    + формат ответа. Версия читается из кэша, поэтому 304 отдается без запросов к БД.
+    Без общего кэша ETag не выдается: версию каталога другие воркеры не увидят.
+    """
+    if not is_shared_cache():
+        return None
+    key = f'{catalog_version()}:{request.get_full_path()}:{request.headers.get("accept", "")}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields', OpenApiTypes.STR, description='Поля ответа через запятую, например id,name,sell_price.',
+)
+
+
+@method_decorator(condition(etag_func=catalog_etag), name='dispatch')
+class CatalogViewSet(ReadOnlyModelViewSet):
+    """
+    Базовый класс API каталога: публичный доступ без аутентификации (ответ одинаков
+    для всех и не требует запроса к сессии/пользователю) и ETag/304 по версии каталога.
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    # Один запрос на страницу; 304 по ETag - без запросов (common.profiling.QueryBudgetMiddleware)
+    query_budget = 2
+
+
+@extend_schema_view(
+    list=extend_schema(parameters=[
+        OpenApiParameter('q', OpenApiTypes.STR, description='Полнотекстовый поиск.'),
+        OpenApiParameter('category', OpenApiTypes.STR, description='Slug категории.'),
+        OpenApiParameter('on_sale', OpenApiTypes.STR, enum=['on'], description='Только товары со скидкой.'),
+        OpenApiParameter('order_by', OpenApiTypes.STR, enum=list(SORT_OPTIONS), description='Сортировка.'),
+        FIELDS_PARAMETER,
+    ]),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER]),
+)
+class ProductViewSet(CatalogViewSet):
+    """
+    Товары каталога с теми же фильтрами, что и ProductListView (products.utils.filter_catalog),
+    курсорной пагинацией и ?fields=.
+    """
+    serializer_class = ProductSerializer
+    pagination_class = KeysetCursorPagination
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        requested = get_requested_fields(self.request)
+        queryset = Product.objects.all()
+        if requested is None or 'category' in requested:
+            queryset = queryset.select_related('category')
+        if self.action == 'list':
+            params = self.request.query_params
+            queryset = filter_catalog(
+                queryset, query=params.get('q'), category_slug=params.get('category'),
+                on_sale=params.get('on_sale') == 'on', order_by=params.get('order_by'),
+            )
+        return only_requested_fields(queryset, ProductSerializer, requested, required=('id', 'slug'))
+
+
+class CategoryViewSet(CatalogViewSet):
+    """
+    Категории со счетчиками товаров - из реестра категорий, без запросов к БД.
+    """
+    serializer_class = CategorySerializer
+    pagination_class = None
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        # Генератору схемы нужен QuerySet модели, а не список из реестра
+        if getattr(self, 'swagger_fake_view', False):
+            return Category.objects.none()
+        return category_registry.all()
+
+    def get_object(self):
+        category = category_registry.get(self.kwargs['slug'])
+        if category is None:
+            raise Http404('Категория не найдена.')
+        return category
@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+
+from .views import ProductDetailView, ProductListView
+
+
+class AsyncProductListView(ProductListView):
+    """
+    Асинхронный вариант каталога (ASYNC_VIEWS, запуск под ASGI): страница товаров и COUNT(*)
+    читаются через async-API QuerySet. Шаблоны Django отрисовываются только синхронно,
+    поэтому контекст (реестр категорий, версии фрагментов) и TemplateResponse
+    обрабатываются в потоке sync_to_async.
+    """
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.paginated = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        context = await sync_to_async(self.get_context_data)()
+        return self.render_to_response(context)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Страница уже загружена в get
+        return self.paginated
+
+
+class AsyncProductDetailView(ProductDetailView):
+    """
+    Асинхронный вариант страницы товара: товар загружается QuerySet.aget (aget_object_or_404).
+    """
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            self.get_queryset(), **{self.get_slug_field(): self.kwargs.get(self.slug_url_kwarg)}
+        )
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
@@ -0,0 +1,56 @@
+from django.core.checks import Error, Tags, Warning, register
+from django.db.models import F
+
+from common.cache import is_shared_cache
+from .models import Product
+from .sorting import SORT_OPTIONS
+
+
+def _index_matches(index, option):
+    if index.fields:
+        return tuple(index.fields) == option.ordering
+
+    expected = []
+    for field in option.ordering:
+        name = field.lstrip('-')
+        expression = option.annotations.get(name, F(name))
+        expected.append(expression.desc() if field.startswith('-') else expression)
+    return tuple(index.expressions) == tuple(expected)
+
+
+@register(Tags.models)
+def check_sort_indexes(app_configs, **kwargs):
+    """
+    Каждый вариант сортировки каталога должен опираться на индекс,
+    иначе каталог будет сортировать всю таблицу на каждом запросе.
+    """
+    errors = []
+    for option in SORT_OPTIONS.values():
+        # Сортировку только по первичному ключу обслуживает индекс PK
+        if [field.lstrip('-') for field in option.ordering] == ['id']:
+            continue
+        if not any(_index_matches(index, option) for index in Product._meta.indexes):
+            errors.append(Error(
+                f'Сортировка каталога "{option.key}" ({", ".join(option.ordering)}) не поддержана индексом.',
+                hint='Добавьте составной индекс или индекс по выражению в Product.Meta.indexes и миграцию.',
+                obj=Product,
+                id='products.E001',
+            ))
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш фрагментов, ETag API каталога и версия реестра категорий рассчитаны на общий для всех
+    воркеров кэш. С LocMemCache они отключаются (common.cache.is_shared_cache) - это стоит знать
+    при выкладке с несколькими воркерами.
+    """
+    if is_shared_cache():
+        return []
+    return [Warning(
+        'Кэш по умолчанию - LocMemCache, свой у каждого воркера: кэш фрагментов товаров и ETag каталога '
+        'отключены, реестр категорий перечитывается из БД.',
+        hint='Задайте общий кэш: CACHE_BACKEND и CACHE_LOCATION (например, Memcached или Redis).',
+        id='products.W001',
+    )]
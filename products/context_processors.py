@@ -1,10 +1,14 @@
-from .models import Category
+from common.db import replica_reads
+from .registry import category_registry
+
 
 def categories_processor(request):
     """
     Контекстный процессор для добавления списка всех категорий
-    в контекст каждого шаблона.
+    в контекст каждого шаблона. Категории берутся из кэшируемого реестра,
+    поэтому на "теплом" запросе обращений к БД нет, а на холодном - читаем с реплики.
     """
-    return {
-        'categories': Category.objects.all()
-    }
\ No newline at end of file
+    with replica_reads():
+        return {
+            'categories': category_registry.all()
+        }
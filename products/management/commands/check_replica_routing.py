@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from common.db import PIN_COOKIE, REPLICA_ALIAS, replica_configured
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка маршрутизации чтений на реплику (common.db): каталог читает с реплики, остальные '
+        'страницы - из основной базы, после записи клиент закреплен за основной базой. '
+        'Локально реплику заменяет копия базы: createdb -T ios_app_db ios_app_db_replica '
+        'и DB_REPLICA_NAME=ios_app_db_replica.'
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(f'В DATABASES нет "{REPLICA_ALIAS}". Задайте DB_REPLICA_NAME или DB_REPLICA_HOST.')
+        product = Product.objects.select_related('category').first()
+        if product is None:
+            raise CommandError('Нет товаров. Загрузите фикстуры: python manage.py loaddata products/fixtures/initial_data.json')
+
+        client = Client()
+        failures = []
+
+        def check(title, path, expected, **extra):
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                    CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+                response = client.get(path, **extra)
+            self.stdout.write(f'  {title}: {response.status_code} {path} - основная {len(primary)}, реплика {len(replica)}')
+            # Страница каталога читает только реплику; остальные не трогают ее вовсе
+            if expected == 'replica':
+                wrong = not replica or primary
+            else:
+                wrong = bool(replica)
+            if response.status_code >= 400 or wrong:
+                failures.append(f'{title}: ожидались чтения только из {expected}')
+            return response
+
+        catalog = reverse('products:index')
+        check('каталог', catalog, 'replica')
+        check('категория', reverse('products:category', kwargs={'category_slug': product.category.slug}), 'replica')
+        check('товар', reverse('products:product', kwargs={'product_slug': product.slug}), 'replica')
+        check('вход', reverse('users:login'), 'primary')
+
+        # Первое добавление в корзину создает сессию - запись в основную базу
+        response = client.get(reverse('carts:cart_add', kwargs={'product_slug': product.slug}), HTTP_REFERER=catalog)
+        if PIN_COOKIE not in response.cookies:
+            failures.append(f'после записи нет куки {PIN_COOKIE}')
+        check('каталог после записи', catalog, 'primary')
+
+        client.cookies.pop(PIN_COOKIE, None)
+        check('каталог после срока закрепления', catalog, 'replica')
+        client.session.delete()
+
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures:
+            raise CommandError(f'Нарушений: {len(failures)}')
+        self.stdout.write(self.style.SUCCESS('Чтения каталога идут на реплику, после записи - в основную базу.'))
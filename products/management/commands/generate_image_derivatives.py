@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from common import images
+from products.models import Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает уменьшенные копии (AVIF/WebP) изображений товаров и аватаров в пуле процессов. '
+        'Уже созданные файлы пропускаются. Выводит объем оригиналов и производных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие производные.')
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names |= set(User.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names = sorted(name for name in names if default_storage.exists(name))
+        if not names:
+            self.stdout.write('Изображений нет.')
+            return
+
+        started = time.perf_counter()
+        failed = 0
+        # spawn: дочерние процессы не наследуют соединение с БД (см. common.images)
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=images._init_worker) as executor:
+            futures = {
+                executor.submit(images.generate_derivatives, name, force=options['force']): name for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    images.cache.set(images.CACHE_KEY.format(name=name), future.result(), timeout=None)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{name}: {e}')
+        elapsed = time.perf_counter() - started
+
+        original_size = sum(default_storage.size(name) for name in names)
+        self.stdout.write(f'Изображений: {len(names)} за {elapsed:.1f} с, ошибок: {failed}')
+        self.stdout.write(f'Оригиналы: {original_size / 1024:.0f} КБ')
+        for fmt in images.DERIVATIVE_FORMATS:
+            sizes = {}
+            for name in names:
+                for width in images.get_derivatives(name).get(fmt, ()):
+                    sizes.setdefault(width, 0)
+                    sizes[width] += default_storage.size(images.derivative_name(name, width, fmt))
+            summary = ', '.join(f'{width}px {size / 1024:.0f} КБ' for width, size in sorted(sizes.items()))
+            self.stdout.write(f'{fmt.upper()}: {summary}')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
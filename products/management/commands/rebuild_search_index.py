@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковый вектор (search_vector) для товаров пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки (по id).')
+        parser.add_argument('--only-missing', action='store_true', help='Только товары без вектора.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Product.objects.order_by('id')
+        if options['only_missing']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        updated = 0
+        last_id = 0
+        while True:
+            # Пагинация по id (keyset) вместо OFFSET - каждая пачка стоит одинаково
+            ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += Product.objects.filter(id__in=ids).update_search_vector()
+            last_id = ids[-1]
+            self.stdout.write(f'Обновлено {updated} товаров...')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Поисковый вектор пересчитан для {updated} товаров.'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_search_vector(apps, schema_editor):
+    # Копия products.models.product_search_vector на момент миграции: историческая
+    # миграция не должна меняться вместе с моделью
+    vector = None
+    for config in ("russian", "simple"):
+        part = SearchVector("name", weight="A", config=config) + SearchVector(
+            "description", weight="B", config=config
+        )
+        vector = part if vector is None else vector + part
+
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_alter_product_price"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_vector_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="product_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
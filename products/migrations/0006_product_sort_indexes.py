@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:57
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+def fill_sold_count(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    sold = models.Subquery(
+        OrderItem.objects.filter(product=models.OuterRef("pk"))
+        .values("product")
+        .annotate(total=models.Sum("quantity"))
+        .values("total")
+    )
+    Product.objects.update(sold_count=models.functions.Coalesce(sold, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_search_vector"),
+        ("orders", "0002_alter_orderitem_price"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="sold_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Продано"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["price", "id"], name="product_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["-price", "id"], name="product_price_desc_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-discount", "id"], name="product_discount_desc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-sold_count", "id"], name="product_sold_count_desc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.math.Round(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("price"),
+                        "*",
+                        django.db.models.expressions.CombinedExpression(
+                            models.Value(1),
+                            "-",
+                            django.db.models.expressions.CombinedExpression(
+                                models.F("discount"), "/", models.Value(100)
+                            ),
+                        ),
+                    ),
+                    2,
+                    output_field=models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                models.F("id"),
+                name="product_sell_price_idx",
+            ),
+        ),
+        migrations.RunPython(fill_sold_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_product_reserved"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("discount__gt", 0)),
+                fields=["category", "-discount", "id"],
+                name="product_category_sale_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("discount__gt", 0)),
+                fields=["id"],
+                name="product_on_sale_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,39 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorField, TrigramWordSimilarity,
+)
 from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Cast, Round
+
+# Конфигурации полнотекстового поиска: русская (со стеммингом) и simple (для артикулов,
+# моделей и латиницы вроде "iPhone 16 Pro", которые русский словарь не нормализует).
+SEARCH_CONFIGS = ('russian', 'simple')
+
+
+def product_search_vector():
+    """
+    Выражение поискового вектора товара: название (вес A) важнее описания (вес B).
+    Используется сигналом и командой rebuild_search_index (миграция 0005 хранит свою копию).
+    """
+    vector = None
+    for config in SEARCH_CONFIGS:
+        part = SearchVector('name', weight='A', config=config) + SearchVector('description', weight='B', config=config)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def sell_price_expression(prefix=''):
+    """
+    Цена со скидкой на стороне БД - то же, что Product.sell_price, но в SQL.
+    То же выражение лежит в индексе product_sell_price_idx, поэтому сортировка по нему
+    идет по индексу. prefix - путь к товару из связанной модели, например 'product__'.
+    """
+    return Round(
+        F(f'{prefix}price') * (Value(1) - F(f'{prefix}discount') / Value(100)), 2,
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+
 
 class Category(models.Model):
     name = models.CharField(max_length=150, unique=True, verbose_name='Название')
@@ -12,6 +47,45 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQueryset(models.QuerySet):
+    """
+    Кастомный QuerySet для каталога: полнотекстовый поиск и обслуживание поискового вектора.
+    """
+    def search(self, query):
+        # Один запрос: совпадения по GIN-индексу search_vector ИЛИ по триграммному индексу
+        # названия (опечатки, порог pg_trgm.word_similarity_threshold).
+        # Точные совпадения выше за счет ранга, опечатки - за счет похожести.
+        search_query = None
+        for config in SEARCH_CONFIGS:
+            part = SearchQuery(query, config=config, search_type='websearch')
+            search_query = part if search_query is None else search_query | part
+
+        # real -> double precision: значения ранга точно переживают курсор keyset-пагинации
+        return self.annotate(
+            rank=Cast(SearchRank(models.F('search_vector'), search_query), models.FloatField()),
+            similarity=Cast(TrigramWordSimilarity(query, 'name'), models.FloatField()),
+        ).filter(
+            Q(search_vector=search_query) | Q(name__trigram_word_similar=query)
+        ).order_by('-rank', '-similarity', 'id')
+
+    def with_sell_price(self):
+        # Цена со скидкой считается в SQL; Product.sell_price вернет аннотированное значение
+        return self.annotate(sell_price=sell_price_expression())
+
+    def update_search_vector(self):
+        # Пересчитывает вектор одним UPDATE, без сигналов post_save
+        return self.update(search_vector=product_search_vector())
+
+
+class ProductManager(models.Manager.from_queryset(ProductQueryset)):
+    """
+    Менеджер товаров по умолчанию не загружает search_vector: он нужен только в SQL
+    (фильтр и ранжирование), а в Python лишь увеличивает объем каждой выборки.
+    """
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Product(models.Model):
     name = models.CharField(max_length=150, verbose_name='Название')
     slug = models.SlugField(max_length=200, unique=True, blank=True, null=True, verbose_name='URL')
@@ -20,18 +94,56 @@ class Product(models.Model):
     price = models.DecimalField(default=0.00, max_digits=10, decimal_places=2, verbose_name='Цена')
     discount = models.DecimalField(default=0.00, max_digits=9, decimal_places=2, verbose_name='Скидка в %')
     quantity = models.PositiveIntegerField(default=0, verbose_name='Количество')
+    # Денормализованная сумма активных резервов (orders.StockReservation) - доступный остаток
+    # читается из строки товара без агрегата по резервам
+    reserved = models.PositiveIntegerField(default=0, editable=False, verbose_name='Зарезервировано')
     category = models.ForeignKey(to=Category, on_delete=models.CASCADE, verbose_name='Категория')
+    sold_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Продано')
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый вектор')
+
+    objects = ProductManager()
 
     class Meta:
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
         ordering = ("id",) # Важно для консистентной пагинации
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            GinIndex(fields=['name'], name='product_name_trgm', opclasses=['gin_trgm_ops']),
+            # Индексы под варианты сортировки каталога (products.sorting.SORT_OPTIONS)
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['-price', 'id'], name='product_price_desc_idx'),
+            models.Index(fields=['-discount', 'id'], name='product_discount_desc_idx'),
+            models.Index(fields=['-sold_count', 'id'], name='product_sold_count_desc_idx'),
+            models.Index(sell_price_expression(), F('id'), name='product_sell_price_idx'),
+            # Фильтр "Акции" (discount > 0): частичные индексы - товары без скидки в них не попадают.
+            # В категории - с сортировкой по скидке, по всему каталогу - в порядке по умолчанию
+            models.Index(fields=['category', '-discount', 'id'], name='product_category_sale_idx',
+                         condition=Q(discount__gt=0)),
+            models.Index(fields=['id'], name='product_on_sale_idx', condition=Q(discount__gt=0)),
+        ]
 
     def __str__(self):
-        return f'Продукт {self.name} | Категория {self.category.name}'
+        # Категория - только если уже загружена (select_related): __str__ не делает запросов,
+        # иначе список товаров в админке или логах дает N+1
+        if Product.category.is_cached(self):
+            return f'Продукт {self.name} | Категория {self.category.name}'
+        return f'Продукт {self.name}'
+
+    @property
+    def available_quantity(self):
+        # Остаток за вычетом товаров в неоплаченных заказах
+        return max(self.quantity - self.reserved, 0)
 
     @property
     def sell_price(self):
+        # Если цена уже посчитана в SQL (annotate(sell_price=...)), берем ее
+        if '_sell_price' in self.__dict__:
+            return self._sell_price
         if self.discount:
             return round(self.price * (1 - self.discount / 100), 2)
-        return self.price
\ No newline at end of file
+        return self.price
+
+    @sell_price.setter
+    def sell_price(self, value):
+        self._sell_price = value
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from common.cache import bump_version, get_version, is_shared_cache
+from .models import Category
+
+VERSION_KEY = 'products:categories:version'
+DATA_KEY = 'products:categories:v{version}'
+
+
+class CategoryRegistry:
+    """
+    Реестр категорий с двумя уровнями кэша:
+    1. Локальный кэш процесса - без обращений к сети и БД.
+    2. Общий кэш Django (CACHES['default']) - один запрос к БД на версию для всех воркеров.
+
+    Версия хранится в общем кэше и увеличивается сигналами при изменении категорий и товаров.
+    Локальная копия сверяет версию не чаще, чем раз в local_ttl секунд. Без общего кэша
+    (LocMemCache) версия другим воркерам не видна - копия просто перечитывается из БД раз в local_ttl.
+    Каждая категория содержит product_count и on_sale_count для сайдбара каталога.
+    """
+    def __init__(self, local_ttl=5):
+        self.local_ttl = local_ttl
+        self._lock = threading.Lock()
+        # (версия, время проверки, список категорий, словарь slug -> категория)
+        self._state = (None, 0, [], {})
+
+    def all(self):
+        return self._get_state()[2]
+
+    def get(self, slug):
+        return self._get_state()[3].get(slug)
+
+    def invalidate(self):
+        bump_version(VERSION_KEY)
+        with self._lock:
+            self._state = (None, 0, [], {})
+
+    def _get_state(self):
+        state = self._state
+        if state[0] is not None and time.monotonic() - state[1] < self.local_ttl:
+            return state
+
+        with self._lock:
+            if not is_shared_cache():
+                categories = self._load()
+                self._state = (0, time.monotonic(), categories, {c.slug: c for c in categories})
+                return self._state
+
+            version = get_version(VERSION_KEY)
+            if self._state[0] == version:
+                # Версия не изменилась - просто продлеваем локальную копию
+                self._state = (version, time.monotonic(), self._state[2], self._state[3])
+                return self._state
+
+            data_key = DATA_KEY.format(version=version)
+            categories = cache.get(data_key)
+            if categories is None:
+                categories = self._load()
+                cache.set(data_key, categories, timeout=60 * 60 * 24)
+
+            self._state = (version, time.monotonic(), categories, {c.slug: c for c in categories})
+            return self._state
+
+    @staticmethod
+    def _load():
+        return list(
+            Category.objects.annotate(
+                product_count=Count('product'),
+                on_sale_count=Count('product', filter=Q(product__discount__gt=0)),
+            ).order_by('id')
+        )
+
+
+category_registry = CategoryRegistry()
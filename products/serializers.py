@@ -0,0 +1,37 @@
+from rest_framework import serializers
+
+from common.api import SparseFieldsetsMixin
+from .models import Category, Product
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    """
+    Категория со счетчиками из реестра категорий (products.registry).
+    """
+    product_count = serializers.IntegerField(read_only=True)
+    on_sale_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'slug', 'product_count', 'on_sale_count')
+
+
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Товар каталога. sell_price - цена со скидкой, available_quantity - остаток без резервов.
+    """
+    category = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+    sell_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    available_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = (
+            'id', 'slug', 'name', 'description', 'image', 'category',
+            'price', 'discount', 'sell_price', 'available_quantity',
+        )
+        # Столбцы вычисляемых полей для ?fields= (common.api.only_requested_fields)
+        field_sources = {
+            'sell_price': ('price', 'discount'),
+            'available_quantity': ('quantity', 'reserved'),
+        }
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.cache import bump_version
+from common.images import ensure_derivatives
+
+from .models import Category, Product
+from .registry import category_registry
+from .utils import PRODUCT_VERSION_KEY, bump_catalog_version, bump_category_version, bump_product_versions
+
+# Поля, от которых зависит поисковый вектор
+SEARCH_FIELDS = {'name', 'description'}
+
+# Поля товара, от которых зависят счетчики в реестре категорий
+CATEGORY_COUNT_FIELDS = {'category', 'category_id', 'discount'}
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Поддерживает search_vector актуальным после сохранения товара.
+    Пропускает сохранения, не затрагивающие текстовые поля (например, list_editable цены в админке),
+    и загрузку фикстур (для них есть команда rebuild_search_index).
+    """
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    Product.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, **kwargs):
+    """
+    Сбрасывает реестр категорий после коммита транзакции,
+    чтобы другие воркеры не закэшировали незафиксированные данные.
+    """
+    transaction.on_commit(category_registry.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_category_counts(sender, update_fields=None, **kwargs):
+    """
+    Счетчики товаров в категориях зависят только от категории и скидки товара.
+    """
+    if update_fields is not None and not CATEGORY_COUNT_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(category_registry.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_version(sender, raw=False, **kwargs):
+    """
+    Любое изменение товара или категории меняет версию каталога (ETag API каталога).
+    """
+    if raw:
+        return
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_derivatives(sender, instance, raw=False, **kwargs):
+    """
+    Новое изображение товара - в фоне создаются его уменьшенные копии (common.images).
+    Пока их нет, фрагменты товара кэшируются с исходным изображением: когда копии готовы,
+    версия товара увеличивается и фрагменты отрисовываются заново уже с srcset копий.
+    """
+    if raw:
+        return
+    key = PRODUCT_VERSION_KEY.format(id=instance.pk)
+    ensure_derivatives(instance.image, on_ready=lambda: bump_version(key))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_fragments(sender, instance, raw=False, **kwargs):
+    """
+    Сбрасывает кэш фрагментов товара (карточка, страница товара). Срабатывает и на
+    list_editable в ProductAdmin: список изменений сохраняет каждый товар через save().
+    """
+    if raw:
+        return
+    bump_product_versions([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_fragments(sender, instance, raw=False, **kwargs):
+    """
+    Название и slug категории есть во фрагментах ее товаров: новая версия категории
+    сбрасывает их все одной операцией.
+    """
+    if raw:
+        return
+    bump_category_version(instance.pk)
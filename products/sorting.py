@@ -0,0 +1,43 @@
+from .models import sell_price_expression
+
+
+class SortOption:
+    """
+    Вариант сортировки каталога.
+    ordering - поля/аннотации для order_by (id в конце - стабильный порядок и keyset-пагинация),
+    annotations - вычисляемые на стороне БД значения, по которым идет сортировка.
+    """
+    def __init__(self, key, label, ordering, annotations=None):
+        self.key = key
+        self.label = label
+        self.ordering = tuple(ordering)
+        self.annotations = annotations or {}
+
+    def apply(self, queryset):
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.order_by(*self.ordering)
+
+
+DEFAULT_SORT = 'default'
+
+# Белый список сортировок. Каждому варианту соответствует индекс в Product.Meta.indexes,
+# это проверяет системная проверка products.E001 (products/checks.py).
+SORT_OPTIONS = {
+    option.key: option for option in (
+        SortOption(DEFAULT_SORT, 'По умолчанию', ['id']),
+        SortOption('price', 'От дешевых к дорогим', ['price', 'id']),
+        SortOption('-price', 'От дорогих к дешевым', ['-price', 'id']),
+        SortOption('sell_price', 'По цене со скидкой', ['sell_price', 'id'], {'sell_price': sell_price_expression()}),
+        SortOption('newest', 'Сначала новые', ['-id']),
+        SortOption('discount', 'По размеру скидки', ['-discount', 'id']),
+        SortOption('popularity', 'Популярные', ['-sold_count', 'id']),
+    )
+}
+
+
+def get_sort_option(key):
+    """
+    Возвращает вариант сортировки по ключу из GET-параметра. Неизвестный ключ - сортировка по умолчанию.
+    """
+    return SORT_OPTIONS.get(key) or SORT_OPTIONS[DEFAULT_SORT]
@@ -0,0 +1,42 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from common.images import derivative_name, get_derivatives
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def picture(image, sizes='100vw', css_class='', alt='', loading='lazy', style=''):
+    """
+    <picture> с srcset производных изображения (AVIF, WebP) под ширину слота sizes.
+    Пока производных нет, отдается оригинал.
+    """
+    if not image:
+        return {}
+    derivatives = get_derivatives(image.name)
+    sources = [{
+        'type': f'image/{fmt}',
+        'srcset': ', '.join(f'{default_storage.url(derivative_name(image.name, width, fmt))} {width}w'
+                            for width in widths),
+    } for fmt, widths in sorted(derivatives.items())]
+    return {
+        'src': image.url, 'sources': sources, 'sizes': sizes,
+        'css_class': css_class, 'alt': alt, 'loading': loading, 'style': style,
+    }
+
+
+@register.simple_tag
+def image_url(image, width):
+    """
+    URL наименьшей производной WebP не уже width (миниатюры в корзине, аватар) или оригинала.
+    """
+    if not image:
+        return ''
+    widths = get_derivatives(image.name).get('webp', [])
+    for derivative_width in widths:
+        if derivative_width >= width:
+            return default_storage.url(derivative_name(image.name, derivative_width, 'webp'))
+    if widths:
+        return default_storage.url(derivative_name(image.name, widths[-1], 'webp'))
+    return image.url
@@ -1,7 +1,14 @@
 from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from common.cache import is_shared_cache
+from products.utils import attach_fragment_versions, fragment_hits, fragment_misses
 
 register = template.Library()
 
+FRAGMENT_KEY = 'fragments:{name}:{id}:{version}'
+
 
 @register.simple_tag()
 def change_params(request, **kwargs):
@@ -18,4 +25,47 @@ def change_params(request, **kwargs):
 @register.filter
 def mul(value, arg):
     """Умножает value на arg."""
-    return value * arg
\ No newline at end of file
+    return value * arg
+
+
+@register.tag('product_fragment')
+def do_product_fragment(parser, token):
+    """
+    {% product_fragment 'product_card' product %}...{% endproduct_fragment %}
+    Кэширует отрисованный блок по ключу из имени фрагмента, id товара и версий товара
+    и категории (products.utils.attach_fragment_versions). Содержимое блока должно зависеть
+    только от товара: корзина и пользователь остаются вне фрагмента. Без общего кэша
+    (common.cache.is_shared_cache) блок отрисовывается каждый раз.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' принимает имя фрагмента и товар.")
+    nodelist = parser.parse(('endproduct_fragment',))
+    parser.delete_first_token()
+    return ProductFragmentNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
+
+
+class ProductFragmentNode(template.Node):
+    def __init__(self, nodelist, name, product):
+        self.nodelist = nodelist
+        self.name = name
+        self.product = product
+
+    def render(self, context):
+        if not is_shared_cache():
+            return self.nodelist.render(context)
+        name = self.name.resolve(context)
+        product = self.product.resolve(context)
+        version = getattr(product, 'fragment_version', None)
+        if version is None:
+            version = attach_fragment_versions([product])[0].fragment_version
+
+        key = FRAGMENT_KEY.format(name=name, id=product.pk, version=version)
+        content = cache.get(key)
+        if content is None:
+            fragment_misses.inc(name)
+            content = self.nodelist.render(context)
+            cache.set(key, content, settings.FRAGMENT_CACHE_TIMEOUT)
+        else:
+            fragment_hits.inc(name)
+        return content
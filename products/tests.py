@@ -1,3 +1,68 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+
+from common.cache import bump_version
+from products.api_views import catalog_etag
+from products.models import Category, Product
+from products.registry import CategoryRegistry
+from products.utils import PRODUCT_VERSION_KEY
+
+FRAGMENT = Template("{% load products_tags %}{% product_fragment 'product_card' product %}{{ product.name }}"
+                    "{% endproduct_fragment %}")
+
+
+def shared_cache():
+    # Файловый кэш общий для всех процессов, как Memcached или Redis в продакшене
+    return override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='products-tests-'),
+    }})
+
+
+class SharedCacheTests(TestCase):
+    """
+    То, что держится на версиях в кэше (фрагменты товаров, ETag каталога, реестр категорий),
+    кэшируется только в общем кэше: с LocMemCache версию, увеличенную одним воркером,
+    другие не видят.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Телефоны', slug='phones')
+        cls.product = Product.objects.create(name='Телефон', slug='phone', category=cls.category, price=100)
+
+    def render(self):
+        return FRAGMENT.render(Context({'product': self.product}))
+
+    def test_fragment_is_not_cached_in_process_local_cache(self):
+        self.assertEqual(self.render(), 'Телефон')
+        self.product.name = 'Новый телефон'
+        self.assertEqual(self.render(), 'Новый телефон')
+
+    def test_fragment_is_cached_until_product_version_changes(self):
+        with shared_cache():
+            self.assertEqual(self.render(), 'Телефон')
+            self.product.name = 'Новый телефон'
+            self.assertEqual(self.render(), 'Телефон')
+
+            bump_version(PRODUCT_VERSION_KEY.format(id=self.product.id))
+            # Версию фрагмента представление проставляет заново на каждый запрос
+            del self.product.fragment_version
+            self.assertEqual(self.render(), 'Новый телефон')
+            cache.clear()
+
+    def test_catalog_etag_requires_shared_cache(self):
+        request = RequestFactory().get('/api/products/')
+        self.assertIsNone(catalog_etag(request))
+        with shared_cache():
+            self.assertIsNotNone(catalog_etag(request))
+            cache.clear()
+
+    def test_registry_reloads_from_database_without_shared_cache(self):
+        registry = CategoryRegistry(local_ttl=0)
+        self.assertIsNone(registry.get('tablets'))
+        # bulk_create без сигналов: версия не увеличивается, изменение видно только через БД
+        Category.objects.bulk_create([Category(name='Планшеты', slug='tablets')])
+        self.assertIsNotNone(registry.get('tablets'))
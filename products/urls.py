@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from .views import ProductListView, ProductDetailView
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncProductDetailView as ProductDetailView, AsyncProductListView as ProductListView
+else:
+    from .views import ProductListView, ProductDetailView
 
 app_name = 'products'
 
@@ -7,4 +12,4 @@ urlpatterns = [
     path('', ProductListView.as_view(), name='index'),
     path('category/<slug:category_slug>/', ProductListView.as_view(), name='category'),
     path('product/<slug:product_slug>/', ProductDetailView.as_view(), name='product'),
-]
\ No newline at end of file
+]
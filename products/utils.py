@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from common.cache import bump_version, get_version, is_shared_cache
+from common.metrics import Counter
+from .sorting import DEFAULT_SORT, get_sort_option
+
+# Версия каталога: растет при любом видимом изменении товаров и категорий (цены, скидки,
+# наличие). На ней построены ETag API каталога - неизмененная страница отдается 304 без БД.
+CATALOG_VERSION_KEY = 'products:catalog:version'
+
+
+def catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Увеличивает версию каталога после коммита текущей транзакции (сразу, если транзакции нет).
+    """
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+# Версии товара и категории входят в ключи кэша фрагментов (products_tags.product_fragment):
+# изменение товара сбрасывает его фрагменты, изменение категории - фрагменты всех ее товаров.
+PRODUCT_VERSION_KEY = 'products:product:{id}:version'
+CATEGORY_VERSION_KEY = 'products:category:{id}:version'
+
+# Фрагменты шаблонов с данными одного товара
+PRODUCT_FRAGMENTS = ('product_card', 'product_detail')
+fragment_hits = Counter('fragment_cache_hits_total', 'Фрагменты товаров, отданные из кэша.',
+                        label='fragment', values=PRODUCT_FRAGMENTS)
+fragment_misses = Counter('fragment_cache_misses_total', 'Фрагменты товаров, отрисованные заново.',
+                          label='fragment', values=PRODUCT_FRAGMENTS)
+
+
+def bump_product_versions(product_ids):
+    """
+    Сбрасывает кэш фрагментов товаров после коммита. Нужна и там, где товары меняются
+    UPDATE без сигналов (резервирование остатков при оформлении заказа).
+    """
+    product_ids = list(product_ids)
+
+    def bump():
+        for product_id in product_ids:
+            bump_version(PRODUCT_VERSION_KEY.format(id=product_id))
+
+    transaction.on_commit(bump)
+
+
+def bump_category_version(category_id):
+    transaction.on_commit(lambda: bump_version(CATEGORY_VERSION_KEY.format(id=category_id)))
+
+
+def attach_fragment_versions(products):
+    """
+    Проставляет товарам fragment_version ("<версия товара>.<версия категории>") одним
+    get_many на всю страницу вместо двух чтений кэша на каждый фрагмент.
+    """
+    products = list(products)
+    if not is_shared_cache():
+        # Фрагменты не кэшируются (products_tags.ProductFragmentNode), версии не нужны
+        return products
+    keys = {}
+    for product in products:
+        keys[product.id] = (
+            PRODUCT_VERSION_KEY.format(id=product.id), CATEGORY_VERSION_KEY.format(id=product.category_id),
+        )
+    versions = cache.get_many({key for pair in keys.values() for key in pair})
+    for product in products:
+        # Версии, которых еще нет в кэше, создаются (редко: первый показ после очистки кэша)
+        product_version, category_version = (
+            versions[key] if key in versions else get_version(key) for key in keys[product.id]
+        )
+        product.fragment_version = f'{product_version}.{category_version}'
+    return products
+
+
+def filter_catalog(queryset, query=None, category_slug=None, on_sale=False, order_by=None):
+    """
+    Фильтры и сортировка каталога - общие для ProductListView и API каталога:
+    0. Полнотекстовый поиск.
+    1. Фильтрация по категории.
+    2. Фильтрация по акции.
+    3. Сортировка (только из белого списка, каждая опирается на индекс).
+       При поиске сортировка по умолчанию - по релевантности.
+    """
+    # Полнотекстовый поиск по GIN-индексу с ранжированием и поиском с опечатками
+    if query:
+        queryset = queryset.search(query)
+
+    if category_slug:
+        queryset = queryset.filter(category__slug=category_slug)
+
+    if on_sale:
+        queryset = queryset.filter(discount__gt=0)
+
+    sort_option = get_sort_option(order_by)
+    if not (query and sort_option.key == DEFAULT_SORT):
+        queryset = sort_option.apply(queryset)
+
+    return queryset
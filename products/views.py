@@ -1,51 +1,46 @@
-from django.db.models import Q
 from django.views.generic import ListView, DetailView
-from .models import Product, Category
 
+from common.pagination import KeysetPaginationMixin
+from .models import Product
+from .registry import category_registry
+from .sorting import SORT_OPTIONS, get_sort_option
+from .utils import attach_fragment_versions, filter_catalog
 
-class ProductListView(ListView):
+
+class ProductListView(KeysetPaginationMixin, ListView):
     model = Product
     template_name = 'products/product_list.html'
     context_object_name = 'products'
     paginate_by = 9
+    # Допустимое число SQL-запросов (common.profiling.QueryBudgetMiddleware)
+    query_budget = 7
+    # Только чтение - GET-запросы обслуживает реплика (common.db.ReplicaRoutingMiddleware)
+    read_replica = True
+    # ?cursor= включает keyset-пагинацию (бесконечная прокрутка);
+    # estimate_count = True - оценка числа товаров вместо COUNT(*), см. KeysetPaginationMixin
 
     def get_queryset(self):
         """
         Переопределяем queryset для добавления ВСЕЙ нашей логики:
-        1. Фильтрация по категории.
-        2. Фильтрация по акции.
-        3. Сортировка.
+        поиск, категория, акция и сортировка (products.utils.filter_catalog).
         """
-        queryset = super().get_queryset().select_related('category')
-
-
-        query = self.request.GET.get('q')
-        if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) | Q(description__icontains=query)
-            )
-
-        category_slug = self.kwargs.get('category_slug')
-
-        if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
-
-        on_sale = self.request.GET.get('on_sale')
-        order_by = self.request.GET.get('order_by')
-
-        if on_sale == 'on':
-            queryset = queryset.filter(discount__gt=0)
-
-        if order_by and order_by != 'default':
-            queryset = queryset.order_by(order_by)
-
-        return queryset
+        return filter_catalog(
+            super().get_queryset().select_related('category'),
+            query=self.request.GET.get('q'),
+            category_slug=self.kwargs.get('category_slug'),
+            on_sale=self.request.GET.get('on_sale') == 'on',
+            order_by=self.request.GET.get('order_by'),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Каталог'
-        context['categories'] = Category.objects.all()
+        context['categories'] = category_registry.all()
         context['is_catalog_page'] = True
+        context['sort_options'] = SORT_OPTIONS.values()
+        context['current_sort'] = get_sort_option(self.request.GET.get('order_by')).key
+        # Версии для ключей кэша карточек - одним запросом к кэшу на страницу
+        attach_fragment_versions(context['products'])
         return context
 
 
@@ -57,6 +52,8 @@ class ProductDetailView(DetailView):
     template_name = 'products/product_detail.html'
     context_object_name = 'product'
     slug_url_kwarg = 'product_slug'
+    query_budget = 6
+    read_replica = True
 
     def get_context_data(self, **kwargs):
         """
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from common.images import ensure_derivatives
+
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_derivatives(sender, instance, raw=False, **kwargs):
+    """
+    Новый аватар - в фоне создаются его уменьшенные копии (common.images).
+    """
+    if raw:
+        return
+    ensure_derivatives(instance.image)
@@ -5,36 +5,26 @@ from django.contrib.auth.views import LoginView
 from django.contrib.messages.views import SuccessMessageMixin
 from django.views.generic import CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
-from django.db.models import Prefetch, Sum, F
+from django.db.models import Prefetch
 
 from .forms import UserRegistrationForm, ProfileForm, UserLoginForm
 from .models import User
-from carts.models import Cart
+from common.pagination import KeysetPaginator
+from common.profiling import query_budget
 from orders.models import Order, OrderItem
 
+
 class UserLoginView(SuccessMessageMixin, LoginView):
+    """
+    Вход в аккаунт. Корзина анонима переносится в аккаунт
+    обработчиком сигнала user_logged_in (carts.signals).
+    """
     template_name = 'users/login.html'
     form_class = UserLoginForm
+    # Вход с переносом корзины анонима (common.profiling.QueryBudgetMiddleware)
+    query_budget = 18
     success_message = '%(username)s, вы успешно вошли в аккаунт.'
 
-    def form_valid(self, form):
-        session_key = self.request.session.session_key
-        user = form.get_user()
-        auth.login(self.request, user)
-        if session_key:
-            try:
-                anon_cart = Cart.objects.filter(session_key=session_key)
-                if anon_cart.exists():
-                    for item in anon_cart:
-                        cart_item, created = Cart.objects.get_or_create(user=user, product=item.product)
-                        cart_item.quantity += item.quantity
-                        cart_item.save()
-                    anon_cart.delete()
-            except Exception as e:
-                print(f"Login cart merge error: {e}")
-        return super().form_valid(form)
-
     def get_success_url(self):
         next_url = self.request.GET.get('next')
         return next_url or reverse_lazy('pages:index')
@@ -44,24 +34,14 @@ class UserRegistrationView(SuccessMessageMixin, CreateView):
     model = User
     form_class = UserRegistrationForm
     template_name = 'users/registration.html'
+    query_budget = 14
     success_url = reverse_lazy('pages:index')
     success_message = '%(username)s, вы успешно зарегистрированы.'
 
     def form_valid(self, form):
-        session_key = self.request.session.session_key
         user = form.save()
+        # Корзина анонима переносится в аккаунт обработчиком user_logged_in (carts.signals)
         auth.login(self.request, user)
-        if session_key:
-            try:
-                anon_cart = Cart.objects.filter(session_key=session_key)
-                if anon_cart.exists():
-                    for item in anon_cart:
-                        cart_item, created = Cart.objects.get_or_create(user=user, product=item.product)
-                        cart_item.quantity += item.quantity
-                        cart_item.save()
-                    anon_cart.delete()
-            except Exception as e:
-                print(f"Registration cart merge error: {e}")
         messages.success(self.request, self.get_success_message(form.cleaned_data))
         return redirect(self.success_url)
 
@@ -70,19 +50,28 @@ class UserProfileView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
     model = User
     form_class = ProfileForm
     template_name = 'users/profile.html'
+    query_budget = 8
     success_url = reverse_lazy('users:profile')
     success_message = 'Профиль успешно обновлен.'
     def get_object(self, queryset=None): return self.request.user
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Личный кабинет'
-        orders_queryset = Order.objects.filter(user=self.request.user).prefetch_related(Prefetch("orderitem_set", queryset=OrderItem.objects.select_related("product"))).annotate(total_sum=Sum(F('orderitem__quantity') * F('orderitem__price'))).order_by("-created_timestamp")
-        paginator = Paginator(orders_queryset, 5)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        context['page_obj'] = page_obj
+        # Итоги берутся из хранимых полей заказа, страницы - keyset по индексу order_user_created_idx,
+        # без агрегата по позициям и COUNT(*)
+        orders_queryset = (
+            Order.objects.filter(user=self.request.user)
+            .prefetch_related(Prefetch("orderitem_set", queryset=OrderItem.objects.select_related("product")))
+            .order_by("-created_timestamp", "-id")
+        )
+        paginator = KeysetPaginator(orders_queryset, 5)
+        context['page_obj'] = paginator.get_page(self.request.GET.get('cursor'))
         return context
+
+
+@query_budget(6)
 def logout_view(request):
     auth.logout(request)
     messages.info(request, "Вы вышли из аккаунта.")
-    return redirect(reverse_lazy('pages:index'))
\ No newline at end of file
+    return redirect(reverse_lazy('pages:index'))